@@ -1,6 +1,6 @@
 {
     "name": "Provider Chat Integration",
-    "version": "1.0",
+    "version": "1.1",
     "depends": ["base", "mail", "queue_job"],
     "author": "Yorni Felipe Bonilla Paz",
     "category": "Tools",
@@ -10,6 +10,8 @@
     "data": [
         "security/ir.model.access.csv",  # AGREGAR ESTA LÍNEA
         "data/chat_channel_type.xml",
+        "data/queue_job_data.xml",
+        "data/ir_cron_data.xml",
         "views/chat_provider_views.xml",
         "views/provider_config_settings_views.xml",
         "views/res_partner_views.xml",
@@ -19,5 +21,4 @@
             "hey_now_integration/static/src/css/conversation_multimedia.css",
         ],
     },
-    "post_init_hook": "assign_uuids_to_old_messages",
 }
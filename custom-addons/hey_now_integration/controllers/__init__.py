@@ -1 +1,3 @@
-from . import webhook
\ No newline at end of file
+from . import webhook
+from . import media
+from . import metrics
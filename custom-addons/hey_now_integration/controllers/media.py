@@ -0,0 +1,110 @@
+import logging
+
+from odoo import http
+from odoo.exceptions import AccessError, MissingError
+from odoo.http import request, Response
+from odoo.tools import str2bool
+
+_logger = logging.getLogger(__name__)
+
+
+class ChatMediaController(http.Controller):
+
+    @http.route(
+        "/hey_now/media/<int:attachment_id>/<int:expires>/<string:signature>",
+        type="http",
+        auth="public",
+        methods=["GET", "HEAD"],
+        csrf=False,
+    )
+    def chat_media(self, attachment_id: int, expires: int, signature: str, **kwargs):
+        """
+        Servir un adjunto saliente al proveedor con una URL firmada y de corta
+        duración. El archivo se envía desde el filestore sin cargarlo en
+        memoria ni pasar por base64.
+        """
+        attachment = request.env["ir.attachment"].sudo().browse(attachment_id)
+        if not attachment.exists() or not attachment._check_chat_media_signature(
+            expires, signature
+        ):
+            raise request.not_found()
+
+        stream = request.env["ir.binary"]._get_stream_from(attachment)
+        return stream.get_response()
+
+    @http.route(
+        "/hey_now/media/<int:attachment_id>/thumbnail",
+        type="http",
+        auth="user",
+        methods=["GET", "HEAD"],
+    )
+    def chat_media_thumbnail(self, attachment_id: int, **kwargs):
+        """
+        Miniatura (imágenes) o póster (videos) de un adjunto de chat. Mientras
+        el job de chat.media no la haya generado, o si la imagen ya era
+        pequeña, se entrega la imagen original; un video sin póster da 404 y
+        el navegador muestra el reproductor vacío.
+        """
+        attachment = self._get_chat_attachment(attachment_id)
+        is_image = (attachment.mimetype or "").startswith("image/")
+        if attachment.chat_media_pending:
+            # Un video diferido no se descarga completo solo para el póster
+            if not is_image:
+                raise request.not_found()
+            if not self._fetch_chat_media(attachment):
+                return self._media_unavailable()
+
+        if attachment.chat_thumbnail_id:
+            source = attachment.chat_thumbnail_id
+        elif is_image:
+            source = attachment
+        else:
+            raise request.not_found()
+
+        stream = request.env["ir.binary"]._get_stream_from(source)
+        return stream.get_response()
+
+    @http.route(
+        "/hey_now/media/<int:attachment_id>/content",
+        type="http",
+        auth="user",
+        methods=["GET", "HEAD"],
+    )
+    def chat_media_content(self, attachment_id: int, download=None, **kwargs):
+        """
+        Contenido de un adjunto de chat. Si se creó en modo lazy y el job de
+        chat.media aún no lo descargó, se descarga ahora desde el proveedor.
+        """
+        attachment = self._get_chat_attachment(attachment_id)
+        if attachment.chat_media_pending and not self._fetch_chat_media(attachment):
+            return self._media_unavailable()
+
+        stream = request.env["ir.binary"]._get_stream_from(attachment)
+        return stream.get_response(as_attachment=str2bool(download or "0"))
+
+    def _get_chat_attachment(self, attachment_id: int):
+        """Adjunto en sudo, después de comprobar que el usuario puede leerlo"""
+        attachment = request.env["ir.attachment"].browse(attachment_id)
+        if not attachment.sudo().exists():
+            raise request.not_found()
+        try:
+            attachment.check("read")
+        except (AccessError, MissingError):
+            raise request.not_found()
+        return attachment.sudo()
+
+    def _fetch_chat_media(self, attachment) -> bool:
+        try:
+            attachment._fetch_chat_media()
+        except Exception as e:
+            _logger.warning("Could not fetch chat media %s: %s", attachment.id, e)
+            return False
+        return not attachment.chat_media_pending
+
+    def _media_unavailable(self):
+        return Response(
+            "Media not available from the provider",
+            status=502,
+            content_type="text/plain",
+            headers=[("Retry-After", "60")],
+        )
@@ -0,0 +1,105 @@
+import ipaddress
+
+from odoo import http
+from odoo.http import request, Response
+from odoo.tools import consteq
+
+from ..models.chat_message_latency import LATENCY_QUANTILES
+
+METRICS_WINDOW_MINUTES = 15
+WEBHOOK_BACKLOG_METRIC_LIMIT = 100000
+
+
+def _label(value) -> str:
+    return str(value or "").replace("\\", "\\\\").replace('"', '\\"')
+
+
+class ChatMetricsController(http.Controller):
+
+    @http.route("/hey_now/metrics", type="http", auth="public", methods=["GET"])
+    def metrics(self, **kwargs):
+        """
+        Métricas en formato texto de Prometheus: percentiles de latencia por
+        proveedor y etapa (últimos 15 minutos) y mensajes procesados en la
+        última hora. Solo para clientes autorizados, ver _is_client_allowed.
+        """
+        if not self._is_client_allowed():
+            raise request.not_found()
+
+        lines = [
+            "# HELP hey_now_webhook_latency_seconds Latencia de mensajes entrantes"
+            " por etapa",
+            "# TYPE hey_now_webhook_latency_seconds summary",
+        ]
+        latency = request.env["chat.message.latency"].sudo()
+        for provider, stage, values, count, total in latency.get_quantiles(
+            METRICS_WINDOW_MINUTES
+        ):
+            labels = f'provider="{_label(provider)}",stage="{_label(stage)}"'
+            for quantile, value in zip(LATENCY_QUANTILES, values):
+                lines.append(
+                    f'hey_now_webhook_latency_seconds{{{labels},quantile="{quantile}"}}'
+                    f" {value:.6f}"
+                )
+            lines.append(f"hey_now_webhook_latency_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"hey_now_webhook_latency_seconds_count{{{labels}}} {count}")
+
+        lines += [
+            "# HELP hey_now_messages_last_hour Mensajes procesados en la última hora",
+            "# TYPE hey_now_messages_last_hour gauge",
+        ]
+        counter = request.env["chat.message.counter"].sudo()
+        for provider, channel, event, count in counter.get_totals(hours=1):
+            lines.append(
+                f'hey_now_messages_last_hour{{provider="{_label(provider)}",'
+                f'channel="{_label(channel)}",event="{_label(event)}"}} {count}'
+            )
+
+        lines += [
+            "# HELP hey_now_webhook_backlog Jobs de webhooks pendientes (acotado al"
+            " límite de admisión)",
+            "# TYPE hey_now_webhook_backlog gauge",
+            "hey_now_webhook_backlog %d"
+            % request.env["webhook.processor"].sudo()._get_webhook_backlog(
+                WEBHOOK_BACKLOG_METRIC_LIMIT
+            ),
+        ]
+
+        return Response(
+            "\n".join(lines) + "\n",
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+    def _is_client_allowed(self) -> bool:
+        """
+        El cliente envía el token ``hey_now_integration.metrics_token``
+        (cabecera ``Authorization: Bearer`` o parámetro ``token``) o su IP
+        está en ``hey_now_integration.metrics_allowed_ips`` (IPs o redes
+        separadas por comas). Sin ninguno de los dos configurado no se
+        expone: detrás de un proxy o de la red de Docker la IP de origen no
+        identifica al cliente.
+        """
+        params = request.env["ir.config_parameter"].sudo()
+        token = params.get_param("hey_now_integration.metrics_token")
+        if token:
+            header = request.httprequest.headers.get("Authorization", "")
+            scheme, _sep, credentials = header.partition(" ")
+            if scheme.lower() != "bearer":
+                credentials = request.httprequest.args.get("token", "")
+            if consteq(credentials.strip(), token):
+                return True
+
+        allowed = params.get_param("hey_now_integration.metrics_allowed_ips")
+        if not allowed:
+            return False
+        try:
+            remote = ipaddress.ip_address(request.httprequest.remote_addr or "")
+        except ValueError:
+            return False
+        for network in allowed.split(","):
+            try:
+                if remote in ipaddress.ip_network(network.strip(), strict=False):
+                    return True
+            except ValueError:
+                continue
+        return False
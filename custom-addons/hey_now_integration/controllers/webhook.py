@@ -1,31 +1,53 @@
 from odoo.http import request, Response
 import logging
 import json
+import time
 from odoo import http
 
 from ..models.provider.provider_type import ProviderType
 from ..models.payloads.dispatcher import WebhookDispatcher
 from ..models.services.dispatcher import ServiceProviderDispatcher
+from ..models.log_events import log_event, log_message_event
+from ..models.webhook_processor import WEBHOOK_JOB_OPTIONS
 
 _logger = logging.getLogger(__name__)
 
+# Máximo de eventos por petición en /webhook/chat/<provider>/batch
+DEFAULT_BATCH_MAX_EVENTS = 1000
+
 
 class ProviderWebhookController(http.Controller):
 
     @http.route(
-        "/webhook/chat/<string:provider_name>", type="json", auth="public", csrf=False
+        "/webhook/chat/<string:provider_name>",
+        type="http",
+        auth="public",
+        csrf=False,
+        methods=["POST"],
     )
     def receive(self, provider_name: str, **kwargs):
+        """
+        Recibir un evento del proveedor. Es una ruta http y no json: con
+        type="json" Odoo envuelve la respuesta en JSON-RPC con HTTP 200 y el
+        proveedor nunca vería los 202/4xx/429/503 ni el Retry-After.
+        """
+        received_at = time.time()
+        rejected = self._check_admission(provider_name)
+        if rejected:
+            return rejected
         raw_body = request.httprequest.data
         data = {}
 
         try:
             # Decodificar JSON
             data = json.loads(raw_body.decode("utf-8"))
-            _logger.info(
-                "Received webhook for provider %s with data: %s",
-                provider_name,
-                data,
+            # Resumen recortado del payload (sin base64) y muestreado
+            log_message_event(
+                request.env,
+                _logger,
+                "webhook.received",
+                provider=provider_name,
+                payload=data,
             )
         except json.JSONDecodeError:
             return Response(
@@ -45,7 +67,14 @@ class ProviderWebhookController(http.Controller):
             #     payload.message.files,
             # )
         except Exception as e:
-            _logger.error("Error extracting event from webhook: %s", str(e))
+            log_event(
+                _logger,
+                logging.ERROR,
+                "webhook.invalid",
+                provider=provider_name,
+                error=str(e),
+                payload=data,
+            )
             return Response(
                 json.dumps({"status": "error", "message": "Error processing webhook"}),
                 content_type="application/json",
@@ -94,20 +123,68 @@ class ProviderWebhookController(http.Controller):
                 status=400,
             )
 
+        # Sacar los archivos base64 grandes de los argumentos del job
+        try:
+            data = (
+                request.env["webhook.processor"]
+                .sudo()
+                ._offload_inline_media(provider_name, data)
+            )
+        except Exception as e:
+            _logger.error("Error offloading inline media, enqueuing inline: %s", e)
+
+        # Modo bandeja de entrada: un INSERT directo en lugar de un queue.job
+        processor = request.env["webhook.processor"].sudo()
+        if processor._get_webhook_ingest_mode() == "inbox":
+            try:
+                inbox_id = (
+                    request.env["chat.webhook.inbox"]
+                    .sudo()
+                    .enqueue(
+                        provider_name,
+                        data,
+                        payload.message.message_id_provider_chat,
+                        received_at,
+                    )
+                )
+            except Exception as e:
+                _logger.error("Error storing webhook in inbox: %s", str(e))
+                return self._json_response(
+                    {
+                        "status": "error",
+                        "message": "Error enqueuing webhook for processing",
+                    },
+                    500,
+                )
+            return self._json_response(
+                {
+                    "status": "enqueued" if inbox_id else "duplicate",
+                    "inbox_id": inbox_id,
+                    "message": "Webhook received and queued for processing",
+                },
+                202,
+            )
+
         # ENCOLAR INMEDIATAMENTE - Esta es la clave del cambio
         try:
             job = (
                 request.env["webhook.processor"]
-                .with_delay(
-                    priority=5,  # Prioridad alta para webhooks
-                    eta=None,  # Procesar inmediatamente
-                    max_retries=3,  # Reintentos automáticos
-                    channel="webhook.processing",  # Canal específico para webhooks
+                .with_delay(**WEBHOOK_JOB_OPTIONS)
+                .process_webhook_event(
+                    provider_name,
+                    data,
+                    received_at=received_at,
+                    enqueued_at=time.time(),
                 )
-                .process_webhook_event(provider_name, data)
             )
 
-            _logger.info("Webhook enqueued successfully with job UUID: %s", job.uuid)
+            log_message_event(
+                request.env,
+                _logger,
+                "webhook.enqueued",
+                provider=provider_name,
+                job=job.uuid,
+            )
 
             return Response(
                 json.dumps(
@@ -135,6 +212,197 @@ class ProviderWebhookController(http.Controller):
                 status=500,
             )
 
+    @http.route(
+        "/webhook/chat/<string:provider_name>/batch",
+        type="http",
+        auth="public",
+        csrf=False,
+        methods=["POST"],
+    )
+    def receive_batch(self, provider_name: str, **kwargs):
+        """
+        Recibir un arreglo de eventos (o {"events": [...]}) del proveedor.
+        Cada evento se valida por separado y los válidos se encolan juntos
+        con un solo INSERT en queue_job. Responde el resultado de cada uno.
+        """
+        received_at = time.time()
+        rejected = self._check_admission(provider_name)
+        if rejected:
+            return rejected
+        try:
+            events = json.loads(request.httprequest.data.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return self._json_response(
+                {"status": "error", "message": "Invalid JSON format"}, 400
+            )
+        if isinstance(events, dict):
+            events = events.get("events")
+        if not isinstance(events, list) or not events:
+            return self._json_response(
+                {"status": "error", "message": "Expected a non-empty array of events"},
+                400,
+            )
+
+        max_events = int(
+            request.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.webhook_batch_max_events", DEFAULT_BATCH_MAX_EVENTS
+            )
+        )
+        if len(events) > max_events:
+            return self._json_response(
+                {"status": "error", "message": f"Batch exceeds {max_events} events"},
+                413,
+            )
+
+        try:
+            service = ServiceProviderDispatcher(request.env).get_service(
+                ProviderType.get_type(provider_name)
+            )
+        except ValueError as e:
+            _logger.error("Unsupported provider type: %s", str(e))
+            return self._json_response(
+                {"status": "error", "message": "Unsupported provider type"}, 400
+            )
+        if not service.get_is_valid():
+            _logger.error("Authentication failed for provider %s", provider_name)
+            return self._json_response(
+                {"status": "error", "message": "Authentication failed"}, 401
+            )
+
+        processor = request.env["webhook.processor"]
+        results = [None] * len(events)
+        accepted = []
+        for index, data in enumerate(events):
+            try:
+                payload = WebhookDispatcher(provider_name, data).extract_event()
+            except Exception as e:
+                log_event(
+                    _logger,
+                    logging.ERROR,
+                    "webhook.invalid",
+                    provider=provider_name,
+                    index=index,
+                    error=str(e),
+                    payload=data,
+                )
+                results[index] = {
+                    "index": index,
+                    "status": "error",
+                    "message": "Error processing webhook",
+                }
+                continue
+
+            if not service.get_is_valid_channel(payload.channel):
+                results[index] = {
+                    "index": index,
+                    "status": "error",
+                    "message": "Invalid channel",
+                }
+                continue
+
+            try:
+                data = processor.sudo()._offload_inline_media(provider_name, data)
+            except Exception as e:
+                _logger.error("Error offloading inline media, enqueuing inline: %s", e)
+            accepted.append((index, data, payload.message.message_id_provider_chat))
+
+        if accepted and processor.sudo()._get_webhook_ingest_mode() == "inbox":
+            inbox = request.env["chat.webhook.inbox"].sudo()
+            try:
+                for index, data, message_key in accepted:
+                    inbox_id = inbox.enqueue(
+                        provider_name, data, message_key, received_at
+                    )
+                    results[index] = {
+                        "index": index,
+                        "status": "enqueued" if inbox_id else "duplicate",
+                        "inbox_id": inbox_id,
+                    }
+            except Exception as e:
+                _logger.error("Error storing webhook batch in inbox: %s", str(e))
+                return self._json_response(
+                    {
+                        "status": "error",
+                        "message": "Error enqueuing webhook batch for processing",
+                    },
+                    500,
+                )
+        elif accepted:
+            try:
+                job_uuids = processor._enqueue_webhook_events(
+                    provider_name, [item[1] for item in accepted], received_at
+                )
+            except Exception as e:
+                _logger.error("Error enqueuing webhook batch: %s", str(e))
+                return self._json_response(
+                    {
+                        "status": "error",
+                        "message": "Error enqueuing webhook batch for processing",
+                    },
+                    500,
+                )
+            for (index, _data, _key), job_uuid in zip(accepted, job_uuids):
+                results[index] = {
+                    "index": index,
+                    "status": "enqueued",
+                    "job_id": job_uuid,
+                }
+
+        log_message_event(
+            request.env,
+            _logger,
+            "webhook.batch_enqueued",
+            provider=provider_name,
+            events=len(events),
+            enqueued=len(accepted),
+        )
+        return self._json_response(
+            {
+                "status": "enqueued" if accepted else "error",
+                "enqueued": len(accepted),
+                "rejected": len(events) - len(accepted),
+                "results": results,
+            },
+            202 if accepted else 400,
+        )
+
+    def _json_response(self, data, status, headers=None):
+        return Response(
+            json.dumps(data),
+            content_type="application/json",
+            status=status,
+            headers=headers,
+        )
+
+    def _check_admission(self, provider_name: str):
+        """
+        Rechazar el webhook con 429/503 y Retry-After si la cola de
+        webhooks pendientes supera los límites, para que el proveedor lo
+        reintente más tarde. Retorna None si se acepta.
+        """
+        try:
+            rejected = request.env["webhook.processor"].sudo()._check_webhook_admission(
+                provider_name
+            )
+        except Exception as e:
+            # Si no se puede medir la cola se acepta, como antes
+            _logger.error("Error checking webhook backlog: %s", str(e))
+            return None
+        if not rejected:
+            return None
+        status, retry_after = rejected
+        return self._json_response(
+            {
+                "status": "error",
+                "message": "Webhook backlog is full, retry later",
+                "retry_after": retry_after,
+            },
+            status,
+            headers=[("Retry-After", str(retry_after))],
+        )
+
     @http.route(
         "/botpress/webhook/response",
         type="http",
@@ -0,0 +1,54 @@
+import logging
+
+from odoo.tools.sql import column_exists
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50000
+
+
+def migrate(cr, version):
+    """
+    message_id_provider_chat deja de tener un UUID por defecto en todos los
+    mensajes: se limpian los valores fuera de canales de proveedor y se
+    elimina el índice completo para que Odoo lo recree como parcial.
+    """
+    if not version or not column_exists(
+        cr, "mail_message", "message_id_provider_chat"
+    ):
+        return
+
+    cr.execute("DROP INDEX IF EXISTS mail_message__message_id_provider_chat_index")
+
+    cr.execute("SELECT COALESCE(MAX(id), 0) FROM mail_message")
+    max_id = cr.fetchone()[0]
+    cleared = 0
+
+    # Lotes por rango de id: cada UPDATE recorre solo su tramo de la PK
+    for start_id in range(0, max_id, BATCH_SIZE):
+        cr.execute(
+            """
+            UPDATE mail_message m
+            SET message_id_provider_chat = NULL
+            WHERE m.id > %s AND m.id <= %s
+              AND m.message_id_provider_chat IS NOT NULL
+              AND NOT COALESCE(m.is_from_webhook, FALSE)
+              AND NOT (
+                  m.model = 'mail.channel'
+                  AND EXISTS (
+                      SELECT 1 FROM mail_channel c
+                      WHERE c.id = m.res_id AND c.provider_name IS NOT NULL
+                  )
+              )
+        """,
+            (start_id, start_id + BATCH_SIZE),
+        )
+        cleared += cr.rowcount
+        # Confirmar cada lote para no retener bloqueos en toda la tabla
+        cr.commit()
+        _logger.info(
+            "Cleared message_id_provider_chat up to id %s/%s (%s rows)",
+            min(start_id + BATCH_SIZE, max_id),
+            max_id,
+            cleared,
+        )
@@ -2,6 +2,13 @@ from . import res_partner
 from . import res_config_settings
 from . import mail_channel
 from . import mail_message
+from . import ir_attachment
+from . import queue_job
+from . import chat_message_counter
+from . import chat_message_latency
+from . import chat_message_sent_part
+from . import chat_provider_rate_bucket
+from . import chat_webhook_inbox
 from . import webhook_processor
 from . import chat_provider
 from . import chat_channel_type
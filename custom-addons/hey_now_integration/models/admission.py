@@ -0,0 +1,48 @@
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+
+class BacklogGauge:
+    """
+    Último tamaño conocido de la cola de webhooks por base de datos. El
+    conteo se refresca como mucho cada ``ttl`` segundos y lo hace un solo
+    hilo: los demás usan el valor anterior mientras tanto. Es por proceso,
+    cada worker consulta la cola por su cuenta.
+    """
+
+    _values: Dict[Hashable, Tuple[int, float]] = {}
+    _refreshing: set = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, key: Hashable, ttl: float, compute: Callable[[], int]) -> int:
+        now = time.monotonic()
+        with cls._lock:
+            value, updated_at = cls._values.get(key, (None, 0.0))
+            if value is not None and (now - updated_at < ttl or key in cls._refreshing):
+                return value
+            cls._refreshing.add(key)
+        try:
+            value = compute()
+            with cls._lock:
+                cls._values[key] = (value, time.monotonic())
+            return value
+        finally:
+            with cls._lock:
+                cls._refreshing.discard(key)
+
+
+def get_admission_status(
+    backlog: int, soft_limit: int, hard_limit: int
+) -> Optional[int]:
+    """
+    Código HTTP con el que rechazar un webhook según la cola pendiente:
+    429 por encima del límite blando, 503 por encima del duro y None si se
+    acepta. Un límite en 0 lo desactiva.
+    """
+    if hard_limit and backlog >= hard_limit:
+        return 503
+    if soft_limit and backlog >= soft_limit:
+        return 429
+    return None
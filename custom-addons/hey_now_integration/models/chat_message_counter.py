@@ -0,0 +1,132 @@
+import logging
+from collections import defaultdict
+from functools import partial
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Días de contadores que se conservan (ir.config_parameter)
+DEFAULT_RETENTION_DAYS = 30
+
+
+class ChatMessageCounter(models.Model):
+    """
+    Contadores de mensajes por minuto, proveedor, tipo de canal (WhatsApp,
+    Instagram...) y evento. Se incrementan al recibir y enviar mensajes, así
+    las estadísticas leen unas pocas filas en lugar de recorrer mail_message.
+    """
+
+    _name = "chat.message.counter"
+    _description = "Contador de mensajes de chat"
+    _order = "bucket desc"
+    _log_access = False
+
+    bucket = fields.Datetime(string="Minuto", required=True, index=True)
+    provider_name = fields.Char(string="Proveedor", required=True)
+    channel = fields.Char(string="Tipo de canal", required=True, default="")
+    event = fields.Selection(
+        [
+            ("received", "Recibido"),
+            ("duplicate", "Duplicado"),
+            ("sent", "Enviado"),
+            ("failed", "Fallido"),
+        ],
+        string="Evento",
+        required=True,
+    )
+    count = fields.Integer(string="Cantidad", default=0)
+
+    _sql_constraints = [
+        (
+            "unique_bucket",
+            "UNIQUE(bucket, provider_name, channel, event)",
+            "Solo puede existir un contador por minuto, proveedor, canal y evento.",
+        ),
+    ]
+
+    @api.model
+    def increment(self, provider_name: str, event: str, channel: str = "", count=1):
+        """
+        Acumular el incremento en la transacción actual. Se suma al contador
+        del minuto después del commit, en una transacción corta propia: la
+        fila compartida no queda bloqueada mientras dura el job y una
+        transacción deshecha no cuenta.
+        """
+        if not count:
+            return
+        postcommit = self.env.cr.postcommit
+        pending = postcommit.data.get("chat.message.counter")
+        if pending is None:
+            pending = postcommit.data["chat.message.counter"] = defaultdict(int)
+            postcommit.add(partial(self._flush_increments, pending))
+        pending[(provider_name or "", channel or "", event)] += count
+
+    @api.model
+    def _flush_increments(self, pending):
+        """
+        Upsert de los incrementos acumulados en READ COMMITTED: con
+        REPEATABLE READ dos transacciones que suman a la misma fila fallan
+        por serialización. Un error solo se registra, el commit ya ocurrió.
+        """
+        rows = sorted(
+            (provider_name, channel, event, count)
+            for (provider_name, channel, event), count in pending.items()
+        )
+        try:
+            with self.pool.cursor() as cr:
+                cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+                for row in rows:
+                    cr.execute(
+                        """
+                        INSERT INTO chat_message_counter
+                            (bucket, provider_name, channel, event, count)
+                        VALUES (
+                            date_trunc('minute', now() AT TIME ZONE 'UTC'),
+                            %s, %s, %s, %s
+                        )
+                        ON CONFLICT (bucket, provider_name, channel, event)
+                        DO UPDATE SET
+                            count = chat_message_counter.count + EXCLUDED.count
+                    """,
+                        row,
+                    )
+        except Exception:
+            _logger.exception("Could not update chat message counters %s", rows)
+
+    @api.model
+    def get_totals(self, hours=24, provider_name=None):
+        """
+        Totales de las últimas ``hours`` horas agrupados por proveedor, canal
+        y evento: [(provider_name, channel, event, count), ...]
+        """
+        query = """
+            SELECT provider_name, channel, event, SUM(count)
+            FROM chat_message_counter
+            WHERE bucket >= (now() AT TIME ZONE 'UTC') - %s * INTERVAL '1 hour'
+        """
+        params = [hours]
+        if provider_name:
+            query += " AND provider_name = %s"
+            params.append(provider_name)
+        query += " GROUP BY provider_name, channel, event"
+        self.env.cr.execute(query, params)
+        return self.env.cr.fetchall()
+
+    @api.autovacuum
+    def _gc_old_counters(self):
+        days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.counter_retention_days", DEFAULT_RETENTION_DAYS
+            )
+        )
+        self.env.cr.execute(
+            """
+            DELETE FROM chat_message_counter
+            WHERE bucket < (now() AT TIME ZONE 'UTC') - %s * INTERVAL '1 day'
+        """,
+            (days,),
+        )
+        _logger.info("GC'd %s chat message counters", self.env.cr.rowcount)
@@ -0,0 +1,104 @@
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Etapas medidas como suma de intervalos entre marcas de BaseEvent.timings.
+# Los adjuntos incluyen la descarga, que ocurre antes de resolver partner y
+# canal, y la inserción en el filestore, que ocurre después.
+LATENCY_STAGES = [
+    ("enqueue", [("received", "enqueued")]),
+    ("queue_wait", [("enqueued", "job_start")]),
+    ("resolve", [("downloaded", "resolved")]),
+    ("attachments", [("download_start", "downloaded"), ("resolved", "attachments")]),
+    ("post", [("attachments", "posted")]),
+    ("total", [("received", "posted")]),
+]
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_RETENTION_HOURS = 24
+
+
+class ChatMessageLatency(models.Model):
+    """
+    Latencia de cada mensaje entrante, desde el 202 del webhook hasta el
+    message_post, desglosada por etapa (segundos).
+    """
+
+    _name = "chat.message.latency"
+    _description = "Latencia de mensajes de chat"
+    _order = "recorded_at desc"
+    _log_access = False
+
+    recorded_at = fields.Datetime(string="Registrado", required=True, index=True)
+    provider_name = fields.Char(string="Proveedor", required=True)
+    enqueue = fields.Float(string="Encolado")
+    queue_wait = fields.Float(string="Espera en cola")
+    resolve = fields.Float(string="Partner y canal")
+    attachments = fields.Float(string="Adjuntos (descarga e inserción)")
+    post = fields.Float(string="Publicación")
+    total = fields.Float(string="Total")
+
+    @api.model
+    def record(self, provider_name: str, timings: dict):
+        """Guardar las duraciones de las etapas con marcas de inicio y fin"""
+        values = {}
+        for stage, intervals in LATENCY_STAGES:
+            if all(timings.get(start) and timings.get(end) for start, end in intervals):
+                values[stage] = sum(
+                    max(0.0, timings[end] - timings[start]) for start, end in intervals
+                )
+        if not values:
+            return
+
+        columns = ", ".join(values)
+        placeholders = ", ".join(["%s"] * len(values))
+        self.env.cr.execute(
+            f"""
+            INSERT INTO chat_message_latency
+                (recorded_at, provider_name, {columns})
+            VALUES (now() AT TIME ZONE 'UTC', %s, {placeholders})
+        """,
+            [provider_name or ""] + list(values.values()),
+        )
+
+    @api.model
+    def get_quantiles(self, minutes=15):
+        """
+        Percentiles por proveedor y etapa de los últimos ``minutes`` minutos:
+        [(provider_name, stage, [p50, p95, p99], count, sum), ...]
+        """
+        stages = ", ".join(f"('{stage}', {stage})" for stage, _i in LATENCY_STAGES)
+        self.env.cr.execute(
+            f"""
+            SELECT provider_name, stage.name,
+                   percentile_cont(%s::float[]) WITHIN GROUP (ORDER BY stage.value),
+                   COUNT(*), SUM(stage.value)
+            FROM chat_message_latency,
+                 LATERAL (VALUES {stages}) AS stage(name, value)
+            WHERE recorded_at >= (now() AT TIME ZONE 'UTC') - %s * INTERVAL '1 minute'
+              AND stage.value IS NOT NULL
+            GROUP BY provider_name, stage.name
+            ORDER BY provider_name, stage.name
+        """,
+            (list(LATENCY_QUANTILES), minutes),
+        )
+        return self.env.cr.fetchall()
+
+    @api.autovacuum
+    def _gc_old_latencies(self):
+        hours = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.latency_retention_hours", DEFAULT_RETENTION_HOURS
+            )
+        )
+        self.env.cr.execute(
+            """
+            DELETE FROM chat_message_latency
+            WHERE recorded_at < (now() AT TIME ZONE 'UTC') - %s * INTERVAL '1 hour'
+        """,
+            (hours,),
+        )
+        _logger.info("GC'd %s chat message latencies", self.env.cr.rowcount)
@@ -0,0 +1,85 @@
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Días que se conservan las partes de mensajes que nunca terminaron de enviarse
+DEFAULT_SENT_PART_RETENTION_DAYS = 7
+
+
+class ChatMessageSentPart(models.Model):
+    """
+    Partes (payloads) de un mensaje saliente que el proveedor ya aceptó. Un
+    mensaje con varios adjuntos se envía en varias llamadas: si el job se
+    reintenta a mitad de camino, las partes registradas no se reenvían.
+    """
+
+    _name = "chat.message.sent.part"
+    _description = "Parte enviada de un mensaje de chat"
+    _log_access = False
+
+    # Sin clave foránea: la fila de mail_message está bloqueada (FOR UPDATE)
+    # por el job mientras se registra la parte en otra transacción
+    message_id = fields.Integer(string="Mensaje", required=True, index=True)
+    part_key = fields.Char(string="Clave de la parte", required=True)
+    sent_at = fields.Datetime(string="Enviado", required=True)
+
+    _sql_constraints = [
+        (
+            "unique_part",
+            "UNIQUE(message_id, part_key)",
+            "Cada parte de un mensaje se registra una sola vez.",
+        ),
+    ]
+
+    @api.model
+    def _get_sent_keys(self, message_id: int) -> frozenset:
+        self.env.cr.execute(
+            "SELECT part_key FROM chat_message_sent_part WHERE message_id = %s",
+            (message_id,),
+        )
+        return frozenset(key for (key,) in self.env.cr.fetchall())
+
+    @api.model
+    def _record(self, message_id: int, part_key: str):
+        """
+        Registrar una parte aceptada en una transacción propia: debe quedar
+        aunque el job se deshaga para reintentar las partes siguientes.
+        """
+        with self.pool.cursor() as cr:
+            cr.execute(
+                """
+                INSERT INTO chat_message_sent_part (message_id, part_key, sent_at)
+                VALUES (%s, %s, now() AT TIME ZONE 'UTC')
+                ON CONFLICT (message_id, part_key) DO NOTHING
+            """,
+                (message_id, part_key),
+            )
+
+    @api.model
+    def _forget(self, message_ids):
+        """Borrar las partes de mensajes ya enviados por completo"""
+        self.env.cr.execute(
+            "DELETE FROM chat_message_sent_part WHERE message_id IN %s",
+            (tuple(message_ids),),
+        )
+
+    @api.autovacuum
+    def _gc_sent_parts(self):
+        days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.sent_part_retention_days",
+                DEFAULT_SENT_PART_RETENTION_DAYS,
+            )
+        )
+        self.env.cr.execute(
+            """
+            DELETE FROM chat_message_sent_part
+            WHERE sent_at < (now() AT TIME ZONE 'UTC') - %s * INTERVAL '1 day'
+        """,
+            (days,),
+        )
+        _logger.info("GC'd %s sent chat message parts", self.env.cr.rowcount)
@@ -0,0 +1,71 @@
+from odoo import models, fields, api
+
+
+class ChatProviderRateBucket(models.Model):
+    """
+    Token bucket por cuenta del proveedor, compartido por todos los workers:
+    el estado vive en una fila que se bloquea con FOR UPDATE mientras se
+    consume un token. Un bucket en memoria por proceso dejaba pasar N
+    workers por la tasa configurada.
+    """
+
+    _name = "chat.provider.rate.bucket"
+    _description = "Límite de envío por cuenta de proveedor de chat"
+    _log_access = False
+
+    key = fields.Char(string="Cuenta", required=True)
+    tokens = fields.Float(string="Tokens disponibles")
+    updated_at = fields.Float(string="Actualizado (epoch)")
+
+    _sql_constraints = [
+        ("unique_key", "UNIQUE(key)", "Solo puede existir un bucket por cuenta."),
+    ]
+
+    @api.model
+    def try_acquire(self, key: str, rate: float, burst: float, tokens=1.0) -> float:
+        """
+        Consumir ``tokens`` del bucket ``key`` (``rate`` tokens por segundo
+        hasta ``burst``). Retorna 0 si se consumieron o los segundos a esperar
+        hasta que los haya. Corre en una transacción corta propia, así la fila
+        no queda bloqueada mientras dura el envío.
+        """
+        if not rate or rate <= 0:
+            return 0.0
+        with self.pool.cursor() as cr:
+            if not self.pool.in_test_mode():
+                cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cr.execute(
+                """
+                INSERT INTO chat_provider_rate_bucket (key, tokens, updated_at)
+                VALUES (%s, %s, extract(epoch FROM clock_timestamp()))
+                ON CONFLICT (key) DO NOTHING
+            """,
+                (key, burst),
+            )
+            cr.execute(
+                """
+                SELECT tokens, updated_at FROM chat_provider_rate_bucket
+                WHERE key = %s
+                FOR UPDATE
+            """,
+                (key,),
+            )
+            available, updated_at = cr.fetchone()
+            # El reloj de la base de datos es el mismo para todos los workers
+            cr.execute("SELECT extract(epoch FROM clock_timestamp())")
+            now = cr.fetchone()[0]
+            available = min(burst, available + max(0.0, now - updated_at) * rate)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / rate
+            cr.execute(
+                """
+                UPDATE chat_provider_rate_bucket
+                SET tokens = %s, updated_at = %s
+                WHERE key = %s
+            """,
+                (available, now, key),
+            )
+        return wait
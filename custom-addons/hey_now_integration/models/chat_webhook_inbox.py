@@ -0,0 +1,326 @@
+import logging
+import threading
+import time
+
+from psycopg2.extras import Json
+
+from odoo import models, fields, api
+
+from odoo.addons.queue_job.exception import RetryableJobError
+
+from .log_events import log_event
+
+_logger = logging.getLogger(__name__)
+
+# Mensajes reclamados por consulta y segundos máximos por ejecución del cron
+DEFAULT_INBOX_BATCH_SIZE = 50
+DEFAULT_INBOX_TIME_LIMIT = 45
+# Reintentos de un mensaje fallido y espera base entre ellos (segundos)
+INBOX_MAX_ATTEMPTS = 3
+INBOX_RETRY_DELAY = 30
+# Días que se conservan los mensajes procesados (deduplicación) y fallidos
+DEFAULT_INBOX_RETENTION_DAYS = 7
+# Como mucho un disparo del cron por proceso en este intervalo (segundos)
+INBOX_TRIGGER_INTERVAL = 1.0
+# Consumidores en paralelo: el cron y (n - 1) queue jobs del canal chat.inbox
+DEFAULT_INBOX_CONSUMERS = 1
+
+_last_triggers = {}
+_trigger_lock = threading.Lock()
+
+
+class ChatWebhookInbox(models.Model):
+    """
+    Bandeja de entrada de webhooks: el controlador solo inserta una fila
+    (idempotente por el ID del mensaje en el proveedor) y un cron la
+    consume por lotes con FOR UPDATE SKIP LOCKED, en lugar de crear un
+    queue.job por webhook. Con ``inbox_consumers`` > 1 el cron reparte el
+    trabajo con consumidores adicionales en queue jobs.
+    """
+
+    _name = "chat.webhook.inbox"
+    _description = "Bandeja de entrada de webhooks de chat"
+    _order = "id"
+    _log_access = False
+
+    provider_name = fields.Char(string="Proveedor", required=True)
+    message_key = fields.Char(string="ID del mensaje del proveedor")
+    payload = fields.Json(string="Payload", prefetch=False)
+    state = fields.Selection(
+        [
+            ("pending", "Pendiente"),
+            ("done", "Procesado"),
+            ("failed", "Fallido"),
+        ],
+        string="Estado",
+        required=True,
+        default="pending",
+    )
+    attempts = fields.Integer(string="Intentos", default=0)
+    error = fields.Text(string="Error")
+    received_at = fields.Float(string="Recibido (epoch)")
+    available_at = fields.Datetime(string="Disponible desde", required=True)
+    processed_at = fields.Datetime(string="Procesado")
+
+    def init(self):
+        super().init()
+        cr = self.env.cr
+        # Idempotencia: un mismo mensaje del proveedor entra una sola vez
+        cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS chat_webhook_inbox_message_key_uniq
+            ON chat_webhook_inbox (provider_name, message_key)
+            WHERE message_key IS NOT NULL
+        """
+        )
+        # Solo las filas pendientes, que son las que reclama el consumidor
+        cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS chat_webhook_inbox_pending_idx
+            ON chat_webhook_inbox (available_at, id)
+            WHERE state = 'pending'
+        """
+        )
+
+    @api.model
+    def enqueue(self, provider_name: str, data, message_key=None, received_at=None):
+        """
+        Guardar un webhook con un INSERT directo. Retorna el id de la fila o
+        None si ese mensaje del proveedor ya estaba en la bandeja.
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO chat_webhook_inbox
+                (provider_name, message_key, payload, state, attempts,
+                 received_at, available_at)
+            VALUES (%s, %s, %s, 'pending', 0, %s, now() AT TIME ZONE 'UTC')
+            ON CONFLICT (provider_name, message_key) WHERE message_key IS NOT NULL
+            DO NOTHING
+            RETURNING id
+        """,
+            (provider_name, message_key or None, Json(data), received_at),
+        )
+        row = self.env.cr.fetchone()
+        if row:
+            self._trigger_consumer()
+        return row[0] if row else None
+
+    @api.model
+    def _trigger_consumer(self):
+        """
+        Despertar al cron consumidor sin esperar a su próxima ejecución. Se
+        limita a un disparo por proceso y segundo: cada disparo es otra fila
+        en ir_cron_trigger.
+        """
+        dbname = self.env.cr.dbname
+        now = time.monotonic()
+        with _trigger_lock:
+            if now - _last_triggers.get(dbname, 0.0) < INBOX_TRIGGER_INTERVAL:
+                return
+            _last_triggers[dbname] = now
+        self._trigger_cron()
+
+    @api.model
+    def _trigger_cron(self):
+        cron = self.env.ref(
+            "hey_now_integration.ir_cron_process_webhook_inbox",
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _claim_batch(self, batch_size: int):
+        """
+        Reclamar hasta ``batch_size`` filas pendientes. Quedan bloqueadas
+        hasta el commit, otros consumidores las saltan.
+        """
+        self.env.cr.execute(
+            """
+            SELECT id, provider_name, payload, attempts, received_at,
+                   extract(epoch FROM available_at)
+            FROM chat_webhook_inbox
+            WHERE state = 'pending' AND available_at <= now() AT TIME ZONE 'UTC'
+            ORDER BY available_at, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """,
+            (batch_size,),
+        )
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _process_inbox(self, batch_size=None, time_limit=None, dispatch=True):
+        """
+        Consumidor (cron): procesa lotes hasta vaciar la bandeja o agotar
+        ``time_limit`` segundos, con un commit por lote. Si se agota el
+        tiempo con mensajes pendientes vuelve a disparar el cron en lugar de
+        esperar a su próxima ejecución. Con ``dispatch`` se encolan además
+        los consumidores adicionales configurados.
+        """
+        params = self.env["ir.config_parameter"].sudo()
+        batch_size = batch_size or int(
+            params.get_param(
+                "hey_now_integration.inbox_batch_size", DEFAULT_INBOX_BATCH_SIZE
+            )
+        )
+        time_limit = time_limit or int(
+            params.get_param(
+                "hey_now_integration.inbox_time_limit", DEFAULT_INBOX_TIME_LIMIT
+            )
+        )
+        if dispatch:
+            consumers = int(
+                params.get_param(
+                    "hey_now_integration.inbox_consumers", DEFAULT_INBOX_CONSUMERS
+                )
+            )
+            self._dispatch_consumers(consumers - 1, batch_size)
+        deadline = time.monotonic() + time_limit
+        processed = 0
+        drained = False
+        while time.monotonic() < deadline:
+            rows = self._claim_batch(batch_size)
+            if not rows:
+                drained = True
+                break
+            self._process_batch(rows)
+            processed += len(rows)
+            try:
+                self.env.cr.commit()
+            except Exception:
+                # Lo cacheado durante el lote puede ser de filas que no existen
+                self.env.cr.rollback()
+                self.env.registry.clear_caches()
+                raise
+        if not drained:
+            self._trigger_cron()
+        if processed:
+            _logger.info("Processed %s webhook inbox messages", processed)
+        return processed
+
+    @api.model
+    def _dispatch_consumers(self, count: int, batch_size: int):
+        """
+        Encolar hasta ``count`` consumidores adicionales si hay más de un lote
+        pendiente. Cada uno tiene su identity_key: nunca hay dos jobs para el
+        mismo consumidor.
+        """
+        if count <= 0:
+            return
+        pending = self._count_pending(batch_size * (count + 1))
+        extra = min(count, pending // batch_size - 1)
+        for slot in range(1, extra + 1):
+            self.with_delay(
+                priority=5,
+                identity_key=f"chat_webhook_inbox_consumer:{slot}",
+                description=f"Consumidor {slot} de la bandeja de webhooks",
+            )._process_inbox(batch_size=batch_size, dispatch=False)
+
+    @api.model
+    def _process_batch(self, rows):
+        """
+        Ejecutar process_webhook_event para cada fila en su propio savepoint:
+        un mensaje que falla no deshace los demás del lote. Al deshacer un
+        savepoint se limpian las cachés (ormcache) que pudieron guardar ids
+        de partners o canales creados dentro de él.
+        """
+        processor = self.env["webhook.processor"]
+        done_ids = []
+        for inbox_id, provider_name, payload, attempts, received_at, queued in rows:
+            try:
+                with self.env.cr.savepoint():
+                    processor.process_webhook_event(
+                        provider_name,
+                        payload,
+                        received_at=received_at,
+                        enqueued_at=float(queued),
+                    )
+            except RetryableJobError as e:
+                # Conflicto con otro consumidor: se reintenta sin agotar intentos
+                self.env.registry.clear_caches()
+                self._set_failed_attempt(
+                    inbox_id,
+                    provider_name,
+                    attempts if e.ignore_retry else attempts + 1,
+                    e,
+                    delay=e.seconds,
+                )
+            except Exception as e:
+                self.env.registry.clear_caches()
+                self._set_failed_attempt(inbox_id, provider_name, attempts + 1, e)
+            else:
+                done_ids.append(inbox_id)
+
+        if done_ids:
+            # El payload ya no hace falta, la fila queda para deduplicar
+            self.env.cr.execute(
+                """
+                UPDATE chat_webhook_inbox
+                SET state = 'done', payload = NULL, error = NULL,
+                    processed_at = now() AT TIME ZONE 'UTC'
+                WHERE id IN %s
+            """,
+                (tuple(done_ids),),
+            )
+
+    @api.model
+    def _set_failed_attempt(self, inbox_id, provider_name, attempts, error, delay=None):
+        failed = attempts >= INBOX_MAX_ATTEMPTS
+        log_event(
+            _logger,
+            logging.ERROR if failed else logging.WARNING,
+            "webhook.inbox_failed",
+            provider=provider_name,
+            inbox_id=inbox_id,
+            attempts=attempts,
+            error=str(error),
+        )
+        self.env.cr.execute(
+            """
+            UPDATE chat_webhook_inbox
+            SET state = %s, attempts = %s, error = %s,
+                available_at = now() AT TIME ZONE 'UTC' + %s * INTERVAL '1 second'
+            WHERE id = %s
+        """,
+            (
+                "failed" if failed else "pending",
+                attempts,
+                str(error),
+                INBOX_RETRY_DELAY * attempts if delay is None else delay,
+                inbox_id,
+            ),
+        )
+
+    @api.model
+    def _count_pending(self, limit: int) -> int:
+        self.env.cr.execute(
+            """
+            SELECT count(*) FROM (
+                SELECT 1 FROM chat_webhook_inbox WHERE state = 'pending' LIMIT %s
+            ) AS pending
+        """,
+            (limit,),
+        )
+        return self.env.cr.fetchone()[0]
+
+    @api.autovacuum
+    def _gc_processed_inbox(self):
+        days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.inbox_retention_days",
+                DEFAULT_INBOX_RETENTION_DAYS,
+            )
+        )
+        self.env.cr.execute(
+            """
+            DELETE FROM chat_webhook_inbox
+            WHERE state IN ('done', 'failed')
+              AND COALESCE(processed_at, available_at)
+                  < (now() AT TIME ZONE 'UTC') - %s * INTERVAL '1 day'
+        """,
+            (days,),
+        )
+        _logger.info("GC'd %s webhook inbox messages", self.env.cr.rowcount)
@@ -0,0 +1,416 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from odoo import models, fields, api
+from odoo.tools import consteq
+from odoo.tools.misc import hmac
+from odoo.addons.queue_job.exception import RetryableJobError
+
+from .media.previews import (
+    DEFAULT_THUMBNAIL_SIZE,
+    extract_video_poster,
+    make_image_thumbnail,
+)
+from .media.streaming import decode_base64_to_file, remove_file
+from .payloads.base_event import FileEvent
+
+_logger = logging.getLogger(__name__)
+
+# Alcance de la firma HMAC de las URLs de medios salientes
+CHAT_MEDIA_HMAC_SCOPE = "hey_now_integration.chat_media"
+# Archivos recibidos en el webhook que esperan a su job (por checksum)
+STAGED_MEDIA_DIR = "staged"
+STAGED_MEDIA_MAX_AGE = 7 * 24 * 3600
+CHECKSUM_RE = re.compile(r"^[0-9a-f]{40}$")
+
+
+class IrAttachment(models.Model):
+    _inherit = "ir.attachment"
+
+    chat_media_key = fields.Char(
+        string="Clave de medio del proveedor",
+        index="btree_not_null",
+        readonly=True,
+        copy=False,
+        help="Identificador del archivo en el proveedor de chat (temporal_id o "
+        "checksum). Permite reutilizar el archivo sin volver a descargarlo.",
+    )
+    chat_thumbnail_id = fields.Many2one(
+        "ir.attachment",
+        string="Miniatura de chat",
+        ondelete="set null",
+        readonly=True,
+        copy=False,
+        help="Miniatura de la imagen o póster del video que se muestra en la "
+        "conversación en lugar del archivo original.",
+    )
+    chat_media_pending = fields.Boolean(
+        string="Medio pendiente de descarga",
+        readonly=True,
+        copy=False,
+        help="El adjunto solo tiene la URL del proveedor: el contenido se "
+        "descarga en segundo plano o la primera vez que alguien lo abre.",
+    )
+
+    def unlink(self):
+        thumbnails = self.sudo().chat_thumbnail_id - self
+        res = super().unlink()
+        if thumbnails:
+            thumbnails.unlink()
+        return res
+
+    def _enqueue_chat_previews(self):
+        """
+        Generar en segundo plano (canal chat.media) las miniaturas de las
+        imágenes y los pósters de los videos recibidos.
+        """
+        attachments = self.filtered(
+            lambda a: (a.mimetype or "").startswith(("image/", "video/"))
+            and a.mimetype != "image/svg+xml"
+            and not a.chat_thumbnail_id
+            and not a.chat_media_pending
+        )
+        if attachments:
+            attachments.with_delay(
+                priority=30,
+                description=f"Miniaturas de chat para {len(attachments)} adjuntos",
+            )._generate_chat_previews()
+
+    def _enqueue_chat_media_fetch(self):
+        """
+        Descargar con baja prioridad (canal chat.media) los medios diferidos,
+        un job por adjunto: una URL caída solo reintenta ese adjunto y no
+        deshace los demás del mensaje.
+        """
+        for attachment in self.filtered("chat_media_pending"):
+            attachment.with_delay(
+                priority=50,
+                identity_key=f"fetch_chat_media:{attachment.id}",
+                description=f"Descargar medio de chat {attachment.id}",
+            )._fetch_chat_media()
+
+    def _fetch_chat_media(self):
+        """
+        Descargar y guardar el contenido de los adjuntos diferidos. La fila se
+        bloquea durante la descarga: si el job y un operador lo piden a la
+        vez, el segundo espera y encuentra el archivo ya guardado. Un error
+        de descarga lanza RetryableJobError para todo ``self``, por eso los
+        jobs se encolan de a un adjunto.
+        """
+        downloader = self.env["webhook.processor"].sudo()._get_media_downloader()
+        fetched = self.browse()
+        for attachment in self.sudo():
+            self.env.cr.execute(
+                "SELECT id FROM ir_attachment WHERE id = %s FOR UPDATE",
+                (attachment.id,),
+            )
+            locked = self.env.cr.fetchone()
+            attachment.invalidate_recordset()
+            if not locked or not attachment.chat_media_pending:
+                continue
+
+            result = downloader.download(
+                FileEvent(name=attachment.name, url=attachment.url)
+            )
+            if not result.ok:
+                raise RetryableJobError(
+                    f"Could not fetch chat media {attachment.id}: {result.error}",
+                    seconds=60,
+                )
+            attachment._store_fetched_chat_media(result)
+            fetched |= attachment
+
+        fetched._enqueue_chat_previews()
+        return fetched
+
+    def _store_fetched_chat_media(self, result):
+        """Guardar en el filestore el temporal descargado por _fetch_chat_media"""
+        self.ensure_one()
+        values = {"chat_media_pending": False}
+        content_type = (result.content_type or "").split(";")[0].strip()
+        if content_type and self.mimetype in (False, "application/octet-stream"):
+            values["mimetype"] = content_type
+
+        if self._storage() != "file":
+            with open(result.path, "rb") as f:
+                values["raw"] = f.read()
+            remove_file(result.path)
+            self.write(values)
+            return
+
+        store_fname = self._store_chat_media_file(result.path, result.checksum)
+        self.write(values)
+        self._link_chat_media_blob(store_fname, result.checksum, result.size)
+
+    def _generate_chat_previews(self):
+        """
+        Crear la miniatura de cada adjunto desde el archivo del filestore, sin
+        cargar el original en memoria cuando el almacenamiento es 'file'.
+        Las imágenes que ya son pequeñas no la necesitan.
+        """
+        size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.media_thumbnail_size", DEFAULT_THUMBNAIL_SIZE
+            )
+        )
+        for attachment in self.sudo().exists():
+            if attachment.chat_thumbnail_id:
+                continue
+            path, is_temporary = attachment._get_chat_media_local_path()
+            if not path:
+                continue
+            try:
+                preview = attachment._make_chat_preview(path, size)
+            except Exception as e:
+                _logger.warning(
+                    "Could not generate preview for attachment %s: %s",
+                    attachment.id,
+                    e,
+                )
+                preview = None
+            finally:
+                if is_temporary:
+                    remove_file(path)
+            if not preview:
+                continue
+
+            raw, mimetype = preview
+            name = os.path.splitext(attachment.name or "preview")[0]
+            extension = ".png" if mimetype == "image/png" else ".jpg"
+            attachment.chat_thumbnail_id = self.sudo().create(
+                {
+                    "name": f"{name}_thumbnail{extension}",
+                    "raw": raw,
+                    "mimetype": mimetype,
+                    "res_model": "ir.attachment",
+                    "res_id": attachment.id,
+                }
+            )
+
+    def _make_chat_preview(self, path: str, size: int):
+        """Retorna (bytes, mimetype) o None si no hay miniatura que generar"""
+        self.ensure_one()
+        if (self.mimetype or "").startswith("video/"):
+            poster = extract_video_poster(path, size)
+            return (poster, "image/jpeg") if poster else None
+        return make_image_thumbnail(path, size)
+
+    def _get_chat_media_local_path(self):
+        """
+        Ruta en disco del contenido: el archivo del filestore o, si el adjunto
+        está en la base de datos, un temporal. Retorna (ruta, es_temporal).
+        """
+        self.ensure_one()
+        if self.store_fname:
+            path = self._full_path(self.store_fname)
+            return (path, False) if os.path.isfile(path) else (None, False)
+        raw = self.raw
+        if not raw:
+            return None, False
+        fd, path = tempfile.mkstemp(
+            prefix="chat_media_", dir=self._get_chat_media_tmp_dir()
+        )
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        return path, True
+
+    @api.model
+    def _get_chat_media_tmp_dir(self) -> str:
+        """
+        Directorio temporal dentro del filestore: los archivos descargados se
+        mueven a su ubicación final con un rename, sin volver a copiarlos.
+        """
+        directory = os.path.join(self._filestore(), "chat_media_tmp")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @api.model
+    def _store_chat_media_file(self, path: str, checksum: str) -> str:
+        """
+        Mover un temporal ya hasheado al filestore con la misma ruta que usa
+        ir.attachment (sha[:2]/sha). La ruta depende solo del hash, así que si
+        el contenido ya existe el temporal se descarta y se reutiliza ese
+        archivo. Retorna el store_fname.
+        """
+        # Compatibilidad con la ruta antigua sha[:3]/sha
+        legacy_fname = checksum[:3] + "/" + checksum
+        if os.path.isfile(self._full_path(legacy_fname)):
+            remove_file(path)
+            return legacy_fname
+
+        fname = checksum[:2] + "/" + checksum
+        full_path = self._full_path(fname)
+        if os.path.isfile(full_path):
+            remove_file(path)
+            return fname
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        shutil.move(path, full_path)
+        # Si la transacción falla, el GC del filestore limpia el archivo
+        self._mark_for_gc(fname)
+        return fname
+
+    @api.model
+    def _get_staged_chat_media_path(self, checksum: str) -> str:
+        if not CHECKSUM_RE.match(checksum or ""):
+            raise ValueError(f"Invalid staged media checksum: {checksum!r}")
+        return os.path.join(self._get_chat_media_tmp_dir(), STAGED_MEDIA_DIR, checksum)
+
+    @api.model
+    def _stage_chat_media(self, data: str, max_size: int, start: int = 0):
+        """
+        Decodificar el base64 de un webhook a un archivo del directorio de
+        espera, nombrado por su checksum, para que el job lo reciba como
+        referencia en lugar de llevar el contenido en sus argumentos.
+        Retorna el HashingFileWriter ya cerrado.
+        """
+        staged_dir = os.path.join(self._get_chat_media_tmp_dir(), STAGED_MEDIA_DIR)
+        os.makedirs(staged_dir, exist_ok=True)
+        writer = decode_base64_to_file(data, staged_dir, max_size=max_size, start=start)
+        # Mismo contenido, mismo nombre: os.replace deja una sola copia
+        os.replace(writer.path, self._get_staged_chat_media_path(writer.checksum))
+        return writer
+
+    @api.model
+    def _open_staged_chat_media(self, checksum: str):
+        """
+        Copia temporal (enlace duro si es posible) del archivo en espera o,
+        si otro job ya lo guardó, del archivo del filestore con ese checksum.
+        El original se conserva por si el job se reintenta. Retorna la ruta
+        o None si el contenido ya no está disponible.
+        """
+        sources = [
+            self._get_staged_chat_media_path(checksum),
+            self._full_path(checksum[:2] + "/" + checksum),
+            self._full_path(checksum[:3] + "/" + checksum),
+        ]
+        for source in sources:
+            if not os.path.isfile(source):
+                continue
+            fd, path = tempfile.mkstemp(
+                prefix="chat_media_", dir=self._get_chat_media_tmp_dir()
+            )
+            os.close(fd)
+            os.unlink(path)
+            try:
+                os.link(source, path)
+            except OSError:
+                shutil.copyfile(source, path)
+            return path
+        return None
+
+    @api.autovacuum
+    def _gc_staged_chat_media(self):
+        """Eliminar archivos en espera cuyos jobs nunca llegaron a usarlos"""
+        staged_dir = os.path.join(self._get_chat_media_tmp_dir(), STAGED_MEDIA_DIR)
+        if not os.path.isdir(staged_dir):
+            return
+        limit = time.time() - STAGED_MEDIA_MAX_AGE
+        removed = 0
+        for entry in os.scandir(staged_dir):
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                remove_file(entry.path)
+                removed += 1
+        _logger.info("GC'd %s staged chat media files", removed)
+
+    @api.model
+    def _create_from_chat_media_file(self, path, checksum, file_size, values):
+        """
+        Crear un ir.attachment desde un archivo temporal sin cargarlo en
+        memoria ni pasar por base64. Si el almacenamiento no es 'file' se
+        recurre a ``raw``.
+        """
+        values = dict(values, type="binary")
+        values.pop("datas", None)
+        values.pop("raw", None)
+
+        if self._storage() != "file":
+            with open(path, "rb") as f:
+                values["raw"] = f.read()
+            remove_file(path)
+            return self.create(values)
+
+        store_fname = self._store_chat_media_file(path, checksum)
+        attachment = self.create(values)
+        attachment._link_chat_media_blob(store_fname, checksum, file_size)
+        return attachment
+
+    @api.model
+    def _find_chat_media(self, media_keys):
+        """
+        Buscar attachments ya almacenados en el filestore para las claves de
+        medio dadas. Retorna un diccionario clave -> ir.attachment.
+        """
+        media_keys = [key for key in media_keys if key]
+        if not media_keys:
+            return {}
+
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT ON (chat_media_key) chat_media_key, id
+            FROM ir_attachment
+            WHERE chat_media_key IN %s AND store_fname IS NOT NULL
+            ORDER BY chat_media_key, id DESC
+        """,
+            (tuple(media_keys),),
+        )
+        return {key: self.browse(att_id) for key, att_id in self.env.cr.fetchall()}
+
+    @api.model
+    def _create_from_existing_chat_media(self, source, values):
+        """
+        Crear un attachment nuevo que apunta al mismo archivo del filestore
+        que ``source``: no se descarga ni se copia contenido.
+        """
+        values = dict(values, type="binary", mimetype=source.mimetype)
+        values.pop("datas", None)
+        values.pop("raw", None)
+        attachment = self.create(values)
+        attachment._link_chat_media_blob(
+            source.store_fname, source.checksum, source.file_size
+        )
+        return attachment
+
+    def _link_chat_media_blob(self, store_fname, checksum, file_size):
+        """
+        Asociar el registro a un archivo ya presente en el filestore.
+        create()/write() descartan store_fname, checksum y file_size porque
+        los calculan desde datas; aquí ya los tenemos del hash del streaming.
+        """
+        self.env.cr.execute(
+            """
+            UPDATE ir_attachment
+            SET store_fname = %s, checksum = %s, file_size = %s
+            WHERE id IN %s
+        """,
+            (store_fname, checksum, file_size, tuple(self.ids)),
+        )
+        self.invalidate_recordset(["store_fname", "checksum", "file_size"])
+
+    def _get_chat_media_signature(self, expires: int) -> str:
+        self.ensure_one()
+        return hmac(self.env(su=True), CHAT_MEDIA_HMAC_SCOPE, (self.id, expires))
+
+    def _get_chat_media_signed_url(self, ttl: int) -> str:
+        """
+        URL pública y temporal del adjunto para que el proveedor la descargue
+        en lugar de recibir el archivo en base64 dentro del JSON. La firma
+        cubre el id y la expiración.
+        """
+        self.ensure_one()
+        expires = int(time.time()) + ttl
+        base_url = self.get_base_url().rstrip("/")
+        signature = self._get_chat_media_signature(expires)
+        return f"{base_url}/hey_now/media/{self.id}/{expires}/{signature}"
+
+    def _check_chat_media_signature(self, expires: int, signature: str) -> bool:
+        self.ensure_one()
+        if expires < time.time():
+            return False
+        return consteq(self._get_chat_media_signature(expires), signature or "")
@@ -0,0 +1,88 @@
+import json
+import logging
+import random
+
+# Fracción de eventos por mensaje que se registran en INFO (con DEBUG se
+# registran todos). Parámetro hey_now_integration.log_sample_rate
+DEFAULT_LOG_SAMPLE_RATE = 0.05
+MAX_STRING_LENGTH = 120
+MAX_ITEMS = 20
+MAX_DEPTH = 6
+MAX_EVENT_LENGTH = 2000
+
+
+def summarize_payload(value, depth: int = 0):
+    """
+    Copia reducida de un payload para el log: cadenas largas (base64, HTML)
+    se reemplazan por su longitud y las listas y diccionarios se recortan.
+    """
+    if depth >= MAX_DEPTH:
+        return "..."
+    if isinstance(value, str):
+        if len(value) > MAX_STRING_LENGTH:
+            return f"{value[:40]}...<{len(value)} chars>"
+        return value
+    if isinstance(value, dict):
+        items = list(value.items())
+        summary = {
+            str(key): summarize_payload(item, depth + 1)
+            for key, item in items[:MAX_ITEMS]
+        }
+        if len(items) > MAX_ITEMS:
+            summary["..."] = f"<{len(items) - MAX_ITEMS} more keys>"
+        return summary
+    if isinstance(value, (list, tuple)):
+        summary = [summarize_payload(item, depth + 1) for item in value[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            summary.append(f"<{len(value) - MAX_ITEMS} more items>")
+        return summary
+    return value
+
+
+class LazyEvent:
+    """Campos de un evento; se resumen y serializan solo si se emite el log"""
+
+    __slots__ = ("fields",)
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        text = json.dumps(
+            summarize_payload(self.fields), default=str, ensure_ascii=False
+        )
+        if len(text) > MAX_EVENT_LENGTH:
+            text = f"{text[:MAX_EVENT_LENGTH]}...<{len(text)} chars>"
+        return text
+
+
+def get_log_sample_rate(env) -> float:
+    try:
+        return float(
+            env["ir.config_parameter"]
+            .sudo()
+            .get_param("hey_now_integration.log_sample_rate", DEFAULT_LOG_SAMPLE_RATE)
+        )
+    except (TypeError, ValueError):
+        return DEFAULT_LOG_SAMPLE_RATE
+
+
+def log_event(logger, level, event: str, **fields):
+    """Registrar un evento estructurado: ``<event> {json}``"""
+    if logger.isEnabledFor(level):
+        logger.log(level, "%s %s", event, LazyEvent(fields))
+
+
+def log_message_event(env, logger, event: str, **fields):
+    """
+    Registrar un evento por mensaje: todos en DEBUG y en INFO solo la
+    fracción configurada en hey_now_integration.log_sample_rate.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s %s", event, LazyEvent(fields))
+        return
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    rate = get_log_sample_rate(env)
+    if rate >= 1 or (rate > 0 and random.random() < rate):
+        logger.info("%s %s", event, LazyEvent(fields))
@@ -1,18 +1,58 @@
 from .provider.dispatcher import ProviderDispatcher
-from odoo import models, fields, api
+from .log_events import log_message_event
+from odoo import models, fields, api, tools
+from odoo.exceptions import MissingError
+from odoo.addons.queue_job.exception import RetryableJobError
+from psycopg2.errors import LockNotAvailable, SerializationFailure
 import requests
 import logging
 import json
+import hashlib
+import math
+from datetime import timedelta
 
 _logger = logging.getLogger(__name__)
 
+# Respuestas HTTP del proveedor que se reintentan con el retry_pattern del job
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# Respuestas que indican caída del endpoint y cuentan para el circuit breaker
+BREAKER_FAILURE_STATUS_CODES = {408, 500, 502, 503, 504}
+OUTBOUND_MAX_RETRIES = 10
+# Segundos que se aplaza un envío mientras un mensaje anterior de la misma
+# conversación sigue pendiente, y antigüedad a partir de la cual ese mensaje
+# ya no bloquea (job perdido o cancelado)
+OUTBOUND_ORDER_RETRY_DELAY = 10
+DEFAULT_OUTBOUND_ORDER_TIMEOUT = 3600
+
 
 class MailChannel(models.Model):
     _inherit = "mail.channel"
 
-    provider_metadata = fields.Json("Provider Metadata")
+    # Sin prefetch: solo se lee el JSON cuando cambia el digest
+    provider_metadata = fields.Json("Provider Metadata", prefetch=False)
+    provider_metadata_digest = fields.Char(
+        "Digest de la metadata del proveedor",
+        compute="_compute_provider_metadata_digest",
+        store=True,
+        copy=False,
+    )
     provider_name = fields.Text("Nombre del proveedor")
-    external_channel_id = fields.Text("ID del canal externo")
+    external_channel_id = fields.Text("ID del canal externo", index=True)
+
+    @api.depends("provider_metadata")
+    def _compute_provider_metadata_digest(self):
+        for channel in self:
+            channel.provider_metadata_digest = self._get_provider_metadata_digest(
+                channel.provider_metadata
+            )
+
+    @api.model
+    def _get_provider_metadata_digest(self, metadata) -> str:
+        """SHA1 de la metadata serializada en forma canónica"""
+        canonical = json.dumps(
+            metadata or {}, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
 
     @api.model
     def message_post(self, **kwargs):
@@ -31,7 +71,7 @@ class MailChannel(models.Model):
         # Crear mensaje normalmente (con UUID automático)
         message = super().message_post(**kwargs)
 
-        _logger.info(
+        _logger.debug(
             "Processing message_post for channel %s, message %s", self.id, message.id
         )
 
@@ -49,17 +89,20 @@ class MailChannel(models.Model):
 
         if should_send_to_provider:
             try:
-                _logger.info(
-                    "Sending internal message to provider: %s (UUID: %s)",
-                    message.id,
-                    message.message_id_provider_chat,
+                log_message_event(
+                    self.env,
+                    _logger,
+                    "outbound.enqueued",
+                    provider=self.provider_name,
+                    message=message.id,
+                    uuid=message.message_id_provider_chat,
                 )
-                self._send_to_provider(message, self.provider_name)
+                self._enqueue_send_to_provider(message)
             except Exception as e:
-                _logger.error(f"Error sending message to provider: {e}")
+                _logger.error("Error enqueuing message for provider: %s", e)
                 # No fallar el message_post por errores en el envío al proveedor
         else:
-            _logger.info(
+            _logger.debug(
                 "Skipping send to provider for message %s - is_from_webhook: %s",
                 message.id,
                 getattr(message, "is_from_webhook", False),
@@ -67,8 +110,63 @@ class MailChannel(models.Model):
 
         return message
 
+    def _enqueue_send_to_provider(self, message):
+        """
+        Encolar el envío al proveedor en el canal chat.outbound. El job solo
+        es visible para el runner cuando la transacción del operador hace
+        commit, así message_post no espera la llamada HTTP.
+        """
+        self.ensure_one()
+        message.sudo().write(
+            {"provider_delivery_state": "pending", "provider_delivery_error": False}
+        )
+
+        # Con agrupación activa el job espera la ventana para recoger los
+        # mensajes de texto siguientes de la misma conversación
+        eta = None
+        try:
+            provider = ProviderDispatcher(self.provider_name, self.env).get_provider()
+            window = provider.get_coalesce_window()
+            if window:
+                eta = timedelta(seconds=window)
+        except ValueError as e:
+            _logger.warning("Could not read coalescing window: %s", str(e))
+
+        self.with_delay(
+            eta=eta,
+            max_retries=OUTBOUND_MAX_RETRIES,
+            description=f"Enviar mensaje {message.id} a {self.provider_name}",
+        )._send_to_provider(message, self.provider_name)
+
     def _send_to_provider(self, message, provider_name: str = "Botpress"):
-        """Enviar mensaje al webhook del proveedor - versión simplificada"""
+        """
+        Enviar mensaje al webhook del proveedor. Se ejecuta como queue job:
+        los errores transitorios lanzan RetryableJobError (retry_pattern de
+        queue.job.function) y el resultado queda en provider_delivery_state.
+        """
+        message = message.sudo()
+
+        # Bloquear el mensaje: si un job anterior lo envió agrupado ya no se
+        # reenvía
+        self.env.cr.execute(
+            "SELECT provider_delivery_state FROM mail_message WHERE id = %s FOR UPDATE",
+            (message.id,),
+        )
+        row = self.env.cr.fetchone()
+        if row and row[0] == "sent":
+            _logger.info("Message %s already sent to provider", message.id)
+            return
+
+        # Orden de la conversación: cada mensaje es un job y un reintento
+        # mueve su eta, así que se espera a que salgan los anteriores
+        earlier_id = self._get_earlier_pending_message(message)
+        if earlier_id:
+            raise RetryableJobError(
+                f"Message {message.id} waits for earlier message {earlier_id}",
+                seconds=OUTBOUND_ORDER_RETRY_DELAY,
+                ignore_retry=True,
+            )
+
         try:
             # Obtener el proveedor
             provider = ProviderDispatcher(provider_name, self.env).get_provider()
@@ -77,41 +175,226 @@ class MailChannel(models.Model):
             webhook_url = provider.get_url(config=self.provider_metadata)
             if not webhook_url:
                 _logger.warning("No webhook URL configured for %s", provider_name)
+                self._set_delivery_state(
+                    message, "failed", "No webhook URL configured"
+                )
                 return
 
-            _logger.info(
+            _logger.debug(
                 "Sending message to provider %s at URL: %s", provider_name, webhook_url
             )
 
             # Preparar los datos para enviar
-            payload = provider.get_payload(message)
+            messages = self._get_coalescable_messages(
+                message, provider.get_coalesce_window()
+            )
+            # Partes aceptadas en un intento anterior: no se reenvían
+            sent_parts = self.env["chat.message.sent.part"]
+            sent_keys = sent_parts._get_sent_keys(message.id)
+            if len(messages) > 1:
+                payloads = [provider.get_coalesced_payload(messages)]
+            else:
+                # Un payload por adjunto, generados a medida que se envían
+                payloads = provider.get_payloads(message, sent_keys)
             headers = provider.get_headers()
 
-            # Enviar con timeout optimizado
-            response = requests.post(
-                webhook_url,
-                json=payload,
-                headers=headers,
-                timeout=10,  # Timeout reducido
+        except ValueError as e:
+            _logger.error("Provider configuration error: %s", str(e))
+            self._set_delivery_state(message, "failed", str(e))
+            return
+
+        # Circuit breaker por base URL: con el endpoint caído el job queda
+        # aparcado en la cola sin consumir reintentos ni abrir conexiones; al
+        # vencer el plazo un único job hace de prueba (half-open)
+        breaker = provider.get_circuit_breaker(webhook_url)
+        wait = breaker.before_call()
+        if wait:
+            raise RetryableJobError(
+                f"Circuit open for {provider_name}, message {message.id}",
+                seconds=max(1, math.ceil(wait)),
+                ignore_retry=True,
             )
 
-            if response.status_code == 200:
-                _logger.info("Message sent to provider successfully")
-            else:
+        accepted_key = None
+        recorded = False
+        for payload in payloads:
+            part_key = provider.get_payload_key(payload)
+            if part_key and part_key in sent_keys:
+                continue
+            if accepted_key:
+                # Hay otra parte: registrar la anterior por si esta falla, así
+                # un mensaje de un solo payload no abre otra transacción
+                sent_parts._record(message.id, accepted_key)
+                recorded = True
+            # Token bucket por cuenta del proveedor, un token por llamada: sin
+            # token el job se aplaza sin consumir reintentos y al reintentar
+            # no se reenvían las partes ya registradas
+            wait = provider.acquire_send_slot()
+            if wait:
+                raise RetryableJobError(
+                    f"Rate limit reached for {provider_name}, message {message.id}",
+                    seconds=max(1, math.ceil(wait)),
+                    ignore_retry=True,
+                )
+            response = self._post_to_provider(
+                provider, breaker, webhook_url, payload, headers, message
+            )
+            if response.status_code != 200:
                 _logger.error(
                     "Failed to send message to provider. Status: %s, Response: %s",
                     response.status_code,
-                    response.text,
+                    response.text[:500],
+                )
+                self._set_delivery_state(
+                    messages,
+                    "failed",
+                    f"HTTP {response.status_code}: {response.text[:500]}",
                 )
+                return
+            accepted_key = part_key
+
+        log_message_event(
+            self.env,
+            _logger,
+            "outbound.sent",
+            provider=provider_name,
+            messages=messages.ids,
+        )
+        self._set_delivery_state(messages, "sent")
+        if sent_keys or recorded:
+            sent_parts._forget(messages.ids)
 
-        except ValueError as e:
-            _logger.error("Provider configuration error: %s", str(e))
-        except requests.exceptions.Timeout:
-            _logger.error("Timeout sending message to provider")
-        except requests.exceptions.RequestException as e:
-            _logger.error("Request error sending message to provider: %s", str(e))
-        except Exception as e:
-            _logger.error("Unexpected error sending message to provider: %s", str(e))
+    def _post_to_provider(self, provider, breaker, url, payload, headers, message):
+        """
+        Hacer una llamada al proveedor. Los errores transitorios lanzan
+        RetryableJobError; al reintentar no se reenvían los payloads ya
+        aceptados (chat.message.sent.part).
+        """
+        try:
+            # Sesión keep-alive compartida del proveedor (timeouts en config_extra)
+            response = provider.post(url, json=payload, headers=headers)
+        except (
+            requests.exceptions.Timeout,
+            requests.exceptions.ConnectionError,
+        ) as e:
+            breaker.record_failure()
+            raise RetryableJobError(
+                f"Transient error sending message {message.id} to provider: {e}"
+            ) from e
+
+        if response.status_code in BREAKER_FAILURE_STATUS_CODES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after = response.headers.get("Retry-After", "")
+            raise RetryableJobError(
+                f"Provider answered {response.status_code} for message {message.id}",
+                seconds=int(retry_after) if retry_after.isdigit() else None,
+            )
+        return response
+
+    def _get_earlier_pending_message(self, message):
+        """
+        ID del mensaje pendiente más antiguo de la conversación anterior a
+        ``message``, o None. Un pendiente más viejo que outbound_order_timeout
+        no bloquea: su job se perdió o se canceló.
+        """
+        timeout = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.outbound_order_timeout",
+                DEFAULT_OUTBOUND_ORDER_TIMEOUT,
+            )
+        )
+        self.env["mail.message"].flush_model(["provider_delivery_state"])
+        self.env.cr.execute(
+            """
+            SELECT id FROM mail_message
+            WHERE res_id = %s
+              AND id < %s
+              AND model = 'mail.channel'
+              AND provider_delivery_state = 'pending'
+              AND create_date
+                  >= (now() AT TIME ZONE 'UTC') - %s * INTERVAL '1 second'
+            ORDER BY id
+            LIMIT 1
+        """,
+            (self.id, message.id, timeout),
+        )
+        row = self.env.cr.fetchone()
+        return row[0] if row else None
+
+    def _get_coalescable_messages(self, message, window: float):
+        """
+        Mensajes de texto pendientes que siguen a ``message`` en la misma
+        conversación dentro de la ventana de agrupación, sin saltar ninguno:
+        la agrupación se corta en el primer mensaje con adjuntos o que no se
+        puede bloquear (lo está enviando otro job). Las filas quedan
+        bloqueadas hasta el commit del job.
+        """
+        if not window or message.attachment_ids:
+            return message
+
+        # Candidatos sin bloquear; se bloquean uno a uno en orden
+        self.env.cr.execute(
+            """
+            SELECT m.id, EXISTS (
+                SELECT 1 FROM message_attachment_rel r WHERE r.message_id = m.id
+            )
+            FROM mail_message m
+            WHERE m.model = 'mail.channel'
+              AND m.res_id = %s
+              AND m.id > %s
+              AND m.create_date <= %s::timestamp + %s * INTERVAL '1 second'
+              AND m.provider_delivery_state = 'pending'
+            ORDER BY m.id
+        """,
+            (self.id, message.id, message.create_date, window),
+        )
+        message_ids = [message.id]
+        for message_id, has_attachments in self.env.cr.fetchall():
+            if has_attachments or not self._lock_pending_message(message_id):
+                break
+            message_ids.append(message_id)
+        return message.browse(message_ids)
+
+    def _lock_pending_message(self, message_id: int) -> bool:
+        """
+        Bloquear un mensaje sin esperar. False si otro job lo tiene bloqueado,
+        si cambió después de la instantánea de esta transacción o si ya no
+        está pendiente.
+        """
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(
+                    """
+                    SELECT provider_delivery_state FROM mail_message
+                    WHERE id = %s
+                    FOR UPDATE NOWAIT
+                """,
+                    (message_id,),
+                    log_exceptions=False,
+                )
+                row = self.env.cr.fetchone()
+        except (LockNotAvailable, SerializationFailure):
+            return False
+        return bool(row) and row[0] == "pending"
+
+    def _set_delivery_state(self, message, state: str, error: str = False):
+        """Registrar el resultado del envío en el mensaje (o mensajes agrupados)"""
+        message.sudo().write(
+            {"provider_delivery_state": state, "provider_delivery_error": error}
+        )
+        if state in ("sent", "failed"):
+            self.env["chat.message.counter"].increment(
+                self.provider_name,
+                state,
+                (self.provider_metadata or {}).get("channel_type", ""),
+                len(message),
+            )
 
     def find_or_create_channel(
         self,
@@ -125,31 +408,22 @@ class MailChannel(models.Model):
         Busca un canal existente o crea uno nuevo - Versión simplificada.
         Queue Jobs maneja la concurrencia, no necesitamos locks complejos.
         """
-        # Buscar canal existente
-        channel = self.sudo().search(
-            [
-                ("external_channel_id", "=", external_channel_id),
-                ("channel_type", "=", "chat"),
-            ],
-            limit=1,
-        )
+        # Buscar canal existente (caché por proveedor y canal externo)
+        try:
+            channel = self.sudo().browse(
+                self._get_external_channel_id(provider_name, external_channel_id)
+            )
+        except MissingError:
+            channel = None
 
         if channel:
-            _logger.info("Found existing channel: %s", channel.id)
-
-            # Verificar y actualizar miembros si es necesario
-            current_partner_ids = set(channel.channel_partner_ids.ids)
-            expected_partner_ids = set(partner_ids)
+            channel._add_missing_members(partner_ids)
 
-            if current_partner_ids != expected_partner_ids:
-                missing_partners = expected_partner_ids - current_partner_ids
-                if missing_partners:
-                    _logger.info("Adding missing partners: %s", list(missing_partners))
-                    channel.add_members(list(missing_partners))
-
-            # Actualizar metadata si es diferente
-            if extra_metadata and not self._compare_provider_metadata(
-                channel.provider_metadata, extra_metadata
+            # Actualizar metadata solo si cambia su digest
+            if (
+                extra_metadata
+                and channel.provider_metadata_digest
+                != self._get_provider_metadata_digest(extra_metadata)
             ):
                 _logger.info("Updating channel metadata")
                 channel.write({"provider_metadata": extra_metadata})
@@ -173,16 +447,19 @@ class MailChannel(models.Model):
 
             # Agregar miembros
             channel.add_members(partner_ids)
+            # Si la transacción se deshace, el id no debe quedar en ormcache
+            self.env.cr.postrollback.add(self.env.registry.clear_caches)
 
             _logger.info("Created new channel: %s", channel.id)
             return channel
 
         except Exception as e:
-            _logger.error(f"Error creating channel: {e}")
+            _logger.error("Error creating channel: %s", e)
 
             # Buscar de nuevo por si otro job lo creó mientras tanto
             channel = self.sudo().search(
                 [
+                    ("provider_name", "=", provider_name),
                     ("external_channel_id", "=", external_channel_id),
                     ("channel_type", "=", "chat"),
                 ],
@@ -195,12 +472,70 @@ class MailChannel(models.Model):
             else:
                 raise
 
+    @api.model
+    @tools.ormcache("provider_name", "external_channel_id")
+    def _get_external_channel_id(
+        self, provider_name: str, external_channel_id: str
+    ) -> int:
+        """
+        ID del canal del proveedor (caché LRU de ormcache). Solo lee: si el
+        canal no existe lanza MissingError, que no se guarda en caché.
+        """
+        self.env.cr.execute(
+            """
+            SELECT id FROM mail_channel
+            WHERE provider_name = %s
+              AND external_channel_id = %s
+              AND channel_type = 'chat'
+            ORDER BY id
+            LIMIT 1
+        """,
+            (provider_name, external_channel_id),
+        )
+        result = self.env.cr.fetchone()
+        if not result:
+            raise MissingError(f"No channel for {provider_name}/{external_channel_id}")
+        return result[0]
+
+    def _add_missing_members(self, partner_ids: list):
+        """Agregar los partners que no sean miembros, con una sola consulta"""
+        self.ensure_one()
+        self.env.cr.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM unnest(%s::int[]) AS expected(partner_id)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM mail_channel_member member
+                    WHERE member.channel_id = %s
+                      AND member.partner_id = expected.partner_id
+                )
+            )
+        """,
+            (list(partner_ids), self.id),
+        )
+        if self.env.cr.fetchone()[0]:
+            _logger.info("Adding missing partners to channel %s", self.id)
+            self.sudo().add_members(list(partner_ids))
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "external_channel_id" in vals or "provider_name" in vals:
+            self.clear_caches()
+        return res
+
+    def unlink(self):
+        has_external_channels = any(self.mapped("external_channel_id"))
+        res = super().unlink()
+        if has_external_channels:
+            self.clear_caches()
+        return res
+
     def _compare_provider_metadata(self, current_metadata, new_metadata):
         """Comparar metadata del proveedor para detectar cambios"""
         try:
-            current_str = json.dumps(current_metadata or {}, sort_keys=True)
-            new_str = json.dumps(new_metadata or {}, sort_keys=True)
-            return current_str == new_str
+            return self._get_provider_metadata_digest(
+                current_metadata
+            ) == self._get_provider_metadata_digest(new_metadata)
         except Exception as e:
-            _logger.error(f"Error comparing metadata: {e}")
+            _logger.error("Error comparing metadata: %s", e)
             return False
@@ -1,5 +1,15 @@
+import logging
 import uuid
-from odoo import models, fields, api
+
+import psycopg2
+
+from odoo import models, fields, api, tools
+
+_logger = logging.getLogger(__name__)
+
+# Índice único parcial: un mismo ID de proveedor solo puede existir una vez
+# entre los mensajes que llegan por webhook.
+WEBHOOK_MESSAGE_UNIQUE_INDEX = "mail_message_provider_chat_webhook_uniq"
 
 
 class MailMessage(models.Model):
@@ -7,12 +17,13 @@ class MailMessage(models.Model):
 
     message_id_provider_chat = fields.Char(
         string="ID del mensaje del proveedor",
-        index=True,
+        # Solo los mensajes de canales de proveedor tienen valor: el índice
+        # parcial excluye los NULL del resto del chatter
+        index="btree_not_null",
         readonly=True,
         copy=False,
-        # ✅ MANTENER EL UUID - Tu lógica es correcta
-        default=lambda self: str(uuid.uuid4()),
-        help="UUID único para tracking de mensajes con proveedores externos",
+        help="UUID único para tracking de mensajes con proveedores externos. "
+        "Solo se genera para mensajes de canales de proveedor.",
     )
 
     # ✅ CAMPO PARA IDENTIFICAR ORIGEN
@@ -24,15 +35,113 @@ class MailMessage(models.Model):
         help="Indica si este mensaje proviene de un webhook externo",
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._assign_provider_chat_ids(vals_list)
+        return super().create(vals_list)
+
+    @api.model
+    def _assign_provider_chat_ids(self, vals_list):
+        """
+        Generar el UUID de tracking solo para mensajes de canales con proveedor
+        configurado; el resto de mensajes del chatter queda en NULL.
+        """
+        channel_ids = {
+            vals["res_id"]
+            for vals in vals_list
+            if vals.get("model") == "mail.channel"
+            and vals.get("res_id")
+            and not vals.get("message_id_provider_chat")
+        }
+        if not channel_ids:
+            return
+
+        provider_channel_ids = set(
+            self.env["mail.channel"]
+            .sudo()
+            .browse(channel_ids)
+            .filtered("provider_name")
+            .ids
+        )
+        for vals in vals_list:
+            if (
+                vals.get("model") == "mail.channel"
+                and vals.get("res_id") in provider_channel_ids
+                and not vals.get("message_id_provider_chat")
+            ):
+                vals["message_id_provider_chat"] = str(uuid.uuid4())
+
+    # Resultado del envío asíncrono al proveedor (canal chat.outbound)
+    provider_delivery_state = fields.Selection(
+        [
+            ("pending", "Pendiente"),
+            ("sent", "Enviado"),
+            ("failed", "Fallido"),
+        ],
+        string="Estado de envío al proveedor",
+        readonly=True,
+        copy=False,
+    )
+    provider_delivery_error = fields.Char(
+        string="Error de envío al proveedor",
+        readonly=True,
+        copy=False,
+    )
+
+    def init(self):
+        super().init()
+        self._create_webhook_message_unique_index()
+        # Envíos pendientes por conversación (orden de salida, ver
+        # mail.channel._get_earlier_pending_message)
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS mail_message_provider_pending_idx
+            ON mail_message (res_id, id)
+            WHERE provider_delivery_state = 'pending'
+        """
+        )
+
+    def _create_webhook_message_unique_index(self):
+        """
+        Crear el índice único parcial sobre message_id_provider_chat para
+        mensajes de webhook. Si ya existen duplicados no se bloquea la
+        instalación: se avisa para ejecutar cleanup_duplicate_messages.
+        """
+        cr = self.env.cr
+        if tools.index_exists(cr, WEBHOOK_MESSAGE_UNIQUE_INDEX):
+            return
+
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute(
+                    f"""
+                    CREATE UNIQUE INDEX {WEBHOOK_MESSAGE_UNIQUE_INDEX}
+                    ON mail_message (message_id_provider_chat)
+                    WHERE is_from_webhook AND message_id_provider_chat IS NOT NULL
+                """
+                )
+        except psycopg2.IntegrityError:
+            _logger.warning(
+                "Could not create index %s: duplicated webhook messages exist. "
+                "Run webhook.processor.cleanup_duplicate_messages() and update "
+                "the module again.",
+                WEBHOOK_MESSAGE_UNIQUE_INDEX,
+            )
+
     # ✅ MÉTODO PARA VERIFICAR DUPLICADOS MEJORADO
     @api.model
     def check_duplicate_by_provider_id(self, provider_message_id):
         """
-        Verificar si ya existe un mensaje con este provider_message_id
+        Verificar si ya existe un mensaje de webhook con este provider_message_id.
+        La búsqueda usa el índice único parcial de mensajes de webhook.
         """
         if not provider_message_id:
             return False
 
         return self.search(
-            [("message_id_provider_chat", "=", provider_message_id)], limit=1
+            [
+                ("message_id_provider_chat", "=", provider_message_id),
+                ("is_from_webhook", "=", True),
+            ],
+            limit=1,
         )
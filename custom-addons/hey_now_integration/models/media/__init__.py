@@ -0,0 +1,10 @@
+from .downloader import MediaDownloader, DownloadedFile
+from .streaming import HashingFileWriter, MediaTooLargeError, decode_base64_to_file
+
+__all__ = [
+    "MediaDownloader",
+    "DownloadedFile",
+    "HashingFileWriter",
+    "MediaTooLargeError",
+    "decode_base64_to_file",
+]
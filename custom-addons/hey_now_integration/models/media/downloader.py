@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+import logging
+
+from ..payloads.base_event import FileEvent
+from ..provider.http_pool import HttpPoolConfig, HttpSessionPool
+from .streaming import (
+    CHUNK_SIZE,
+    DEFAULT_MAX_SIZE,
+    HashingFileWriter,
+    MediaTooLargeError,
+)
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 10
+
+
+@dataclass
+class DownloadedFile:
+    """Resultado de la descarga de un FileEvent"""
+
+    file_event: FileEvent
+    path: Optional[str] = None  # Temporal en el directorio del filestore
+    checksum: Optional[str] = None  # SHA1 calculado durante la descarga
+    size: int = 0
+    content_type: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.path is not None
+
+
+class MediaDownloader:
+    """
+    Descarga concurrente de archivos multimedia de los webhooks.
+    No usa el entorno de Odoo: se ejecuta antes de abrir el trabajo en base
+    de datos, con las sesiones keep-alive del pool HTTP del proceso.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout=DEFAULT_TIMEOUT,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        self.directory = directory
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.max_size = max_size
+
+    @property
+    def http_config(self) -> HttpPoolConfig:
+        """Pool del tamaño del paralelismo para no esperar conexiones libres"""
+        return HttpPoolConfig(
+            pool_maxsize=self.max_workers,
+            read_timeout=self.timeout,
+        )
+
+    def download(self, file_event: FileEvent) -> DownloadedFile:
+        """
+        Descargar un único archivo por bloques a un temporal.
+        Los errores se devuelven en el resultado, no se lanzan.
+        """
+        try:
+            config = self.http_config
+            session = HttpSessionPool.get_session(file_event.url, config)
+            with session.get(
+                file_event.url, timeout=config.timeout, stream=True
+            ) as response:
+                response.raise_for_status()
+
+                content_length = int(response.headers.get("content-length") or 0)
+                if self.max_size and content_length > self.max_size:
+                    raise MediaTooLargeError(
+                        f"File of {content_length} bytes exceeds the maximum "
+                        f"allowed size of {self.max_size} bytes"
+                    )
+
+                with HashingFileWriter(self.directory, self.max_size) as writer:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        writer.write(chunk)
+
+                return DownloadedFile(
+                    file_event=file_event,
+                    path=writer.path,
+                    checksum=writer.checksum,
+                    size=writer.size,
+                    content_type=response.headers.get("content-type"),
+                )
+        except Exception as e:
+            return DownloadedFile(file_event=file_event, error=str(e))
+
+    def download_all(self, files: List[FileEvent]) -> List[DownloadedFile]:
+        """
+        Descargar en paralelo (con límite de hilos) los FileEvent con URL.
+        Retorna los resultados en el mismo orden de entrada.
+        """
+        files = [file_event for file_event in files if file_event.url]
+        if len(files) <= 1:
+            results = [self.download(file_event) for file_event in files]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(files)),
+                thread_name_prefix="chat_media",
+            ) as executor:
+                results = list(executor.map(self.download, files))
+
+        for result in results:
+            if not result.ok:
+                _logger.warning(
+                    "Error downloading file from URL %s: %s",
+                    result.file_event.url,
+                    result.error,
+                )
+        return results
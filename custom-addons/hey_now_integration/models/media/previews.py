@@ -0,0 +1,96 @@
+import io
+import logging
+import shutil
+import subprocess
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from odoo.tools.image import IMAGE_MAX_RESOLUTION
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_THUMBNAIL_SIZE = 512
+THUMBNAIL_QUALITY = 80
+# Segundos del video de donde se toma el póster y tiempo máximo de ffmpeg
+POSTER_OFFSET = 1
+POSTER_TIMEOUT = 30
+
+
+def make_image_thumbnail(path: str, size: int = DEFAULT_THUMBNAIL_SIZE):
+    """
+    Miniatura JPEG (o PNG si tiene transparencia) que cabe en ``size`` x
+    ``size``. La imagen se lee desde el archivo: con JPEG, ``draft`` decodifica
+    directamente a una escala reducida. Retorna (bytes, mimetype) o None si
+    la imagen ya es más pequeña que la miniatura. Como en el pipeline de
+    imágenes de Odoo, se rechazan (ValueError) las de más de
+    IMAGE_MAX_RESOLUTION píxeles antes de decodificarlas.
+    """
+    with Image.open(path) as image:
+        if image.width <= size and image.height <= size:
+            return None
+        if image.width * image.height > IMAGE_MAX_RESOLUTION:
+            raise ValueError(
+                f"Image too large for a thumbnail: {image.width}x{image.height}"
+            )
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+            image.save(output, format="PNG", optimize=True)
+            return output.getvalue(), "image/png"
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(output, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+        return output.getvalue(), "image/jpeg"
+
+
+def has_ffmpeg() -> bool:
+    return bool(shutil.which("ffmpeg"))
+
+
+def extract_video_poster(
+    path: str, size: int = DEFAULT_THUMBNAIL_SIZE
+) -> Optional[bytes]:
+    """
+    Póster JPEG de un video con ffmpeg (dependencia opcional del sistema).
+    Si el video dura menos de POSTER_OFFSET se usa el primer fotograma.
+    Retorna None si ffmpeg no está instalado o no pudo extraerlo.
+    """
+    if not has_ffmpeg():
+        return None
+    scale = (
+        f"scale='min({size},iw)':'min({size},ih)'"
+        ":force_original_aspect_ratio=decrease"
+    )
+    for offset in (POSTER_OFFSET, 0):
+        command = [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-ss",
+            str(offset),
+            "-i",
+            path,
+            "-frames:v",
+            "1",
+            "-vf",
+            scale,
+            "-f",
+            "image2",
+            "-c:v",
+            "mjpeg",
+            "pipe:1",
+        ]
+        try:
+            result = subprocess.run(
+                command, capture_output=True, timeout=POSTER_TIMEOUT, check=False
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            _logger.warning("Could not extract video poster: %s", e)
+            return None
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+    return None
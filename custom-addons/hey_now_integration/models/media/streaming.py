@@ -0,0 +1,93 @@
+import base64
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class MediaTooLargeError(ValueError):
+    """El archivo supera el tamaño máximo permitido"""
+
+
+class HashingFileWriter:
+    """
+    Escribe un archivo temporal por bloques calculando el SHA1 (el mismo
+    checksum que usa ir.attachment) y controlando el tamaño máximo.
+    Nunca mantiene el contenido completo en memoria.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self._sha1 = hashlib.sha1()
+        fd, self.path = tempfile.mkstemp(prefix="chat_media_", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+
+    @property
+    def checksum(self) -> str:
+        return self._sha1.hexdigest()
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.max_size and self.size > self.max_size:
+            raise MediaTooLargeError(
+                f"File exceeds the maximum allowed size of {self.max_size} bytes"
+            )
+        self._sha1.update(chunk)
+        self._file.write(chunk)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self):
+        """Cerrar y eliminar el temporal (errores o archivos rechazados)"""
+        self.close()
+        remove_file(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.discard()
+        else:
+            self.close()
+
+
+def remove_file(path: str):
+    """Eliminar un temporal ignorando si ya no existe"""
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def decode_base64_to_file(
+    data: str,
+    directory: str,
+    max_size: int = DEFAULT_MAX_SIZE,
+    start: int = 0,
+    chunk_chars: int = CHUNK_SIZE,
+) -> HashingFileWriter:
+    """
+    Decodificar base64 de forma incremental hacia un archivo temporal.
+    ``start`` permite saltar el prefijo de un data URI sin copiar el string.
+    Los espacios y saltos de línea se descartan bloque a bloque.
+    """
+    with HashingFileWriter(directory, max_size) as writer:
+        carry = ""
+        for offset in range(start, len(data), chunk_chars):
+            chunk = carry + "".join(data[offset : offset + chunk_chars].split())
+            usable = len(chunk) - len(chunk) % 4
+            writer.write(base64.b64decode(chunk[:usable]))
+            carry = chunk[usable:]
+        if carry:
+            # Relleno faltante al final del string
+            writer.write(base64.b64decode(carry + "=" * (-len(carry) % 4)))
+    return writer
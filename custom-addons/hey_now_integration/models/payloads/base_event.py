@@ -95,6 +95,18 @@ class FileEvent:
     url: Optional[str] = None  # URL original del archivo (si aplica)
     file_size: Optional[int] = None  # Tamaño del archivo en bytes
     metadata: Dict[str, Any] = field(default_factory=dict)  # Metadata adicional
+    # Resultado de la descarga previa (MediaDownloader), fuera de la transacción:
+    # temporal en disco con su SHA1 y tamaño, nunca el contenido en memoria
+    local_path: Optional[str] = None
+    local_checksum: Optional[str] = None
+    local_size: Optional[int] = None
+    content_type: Optional[str] = None
+    download_error: Optional[str] = None
+    # Clave del archivo en el proveedor y attachment ya existente con esa clave
+    media_key: Optional[str] = None
+    known_attachment_id: Optional[int] = None
+    # Contenido base64 extraído en el webhook y guardado por checksum
+    staged_checksum: Optional[str] = None
 
 
 @dataclass
@@ -118,6 +130,8 @@ class BaseEvent:
     channel: str  # Tipo de canal de comunicacion por el cual proviene el mensaje Whatsapp,Instagram,Messeger,etc...
     is_incoming: bool  # Indica si el mensaje es entrante o saliente cuando sea True es de entrada(de un usurio) y de debe procesar
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # Marcas de tiempo (epoch) de cada etapa del procesamiento
+    timings: Dict[str, float] = field(default_factory=dict)
 
     def to_json(self):
         """Convertir a JSON string"""
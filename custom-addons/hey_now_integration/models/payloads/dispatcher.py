@@ -17,3 +17,9 @@ class WebhookDispatcher:
         #     return BotpressPayload(self.raw_payload).extract()
         else:
             raise ValueError(f"Unsupported provider: {self.provider_name}")
+
+    def get_media_files(self) -> list:
+        """Entradas de archivos del payload crudo donde pueden venir en base64"""
+        if self.provider_name == "heynow":
+            return HeynowPayload(self.raw_payload).get_media_files()
+        raise ValueError(f"Unsupported provider: {self.provider_name}")
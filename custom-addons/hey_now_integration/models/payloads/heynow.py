@@ -166,7 +166,7 @@ class HeynowPayload:
             files = self._formatter_files(meta_data.get("temporal", []))
             if files and len(files) > 0:
                 mime_type = getattr(files[0], "mimetype", "text/plain")
-                _logger.info(
+                _logger.debug(
                     "Mime type: %s", getattr(files[0], "mimetype", " no trajo")
                 )
 
@@ -189,6 +189,18 @@ class HeynowPayload:
             provider_type=ProviderType.HEYNOW,
         )
 
+    def get_media_files(self) -> List[Dict[str, Any]]:
+        """
+        Returns the raw file entries (data.metaData.temporal), the only place
+        where Heynow sends inline base64 media.
+        """
+        data = self.raw.get("data") if isinstance(self.raw, dict) else None
+        meta_data = data.get("metaData") if isinstance(data, dict) else None
+        files = meta_data.get("temporal") if isinstance(meta_data, dict) else None
+        if not isinstance(files, list):
+            return []
+        return [file for file in files if isinstance(file, dict)]
+
     def _calculate_is_incoming(self) -> bool:
         """
         Returns the is_incoming flag for the Heynow payload.
@@ -207,7 +219,10 @@ class HeynowPayload:
             FileEvent(
                 name=file.get("name", ""),
                 datas=file.get("data", ""),
-                type="binary" if file.get("data") else "url",
+                # dataRef: base64 extraído al recibir el webhook
+                staged_checksum=(file.get("dataRef") or {}).get("checksum"),
+                download_error=file.get("dataError"),
+                type="binary" if file.get("data") or file.get("dataRef") else "url",
                 mimetype=file.get("mimeType", ""),
                 description=file.get(
                     "description",
@@ -2,6 +2,8 @@ from . import heynow
 from . import provider
 from . import provider_type
 from . import chat_provider_config
+from . import http_pool
+from . import circuit_breaker
 from .chat_provider_model import ChatProviderModel
 
 
@@ -10,5 +12,7 @@ __all__ = [
     "provider",
     "provider_type",
     "chat_provider_config",
+    "http_pool",
+    "circuit_breaker",
     "ChatProviderModel",
 ]
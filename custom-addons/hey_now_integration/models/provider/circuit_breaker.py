@@ -0,0 +1,86 @@
+from typing import Dict, Hashable
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de un endpoint del proveedor.
+
+    - closed: las llamadas pasan; ``failure_threshold`` fallos seguidos lo abren.
+    - open: las llamadas se rechazan hasta que pasa ``reset_timeout``.
+    - half_open: se deja pasar una única llamada de prueba; si funciona se
+      cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> float:
+        """
+        Retorna 0 si la llamada puede hacerse o los segundos que conviene
+        esperar antes de volver a intentarlo.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return 0.0
+
+            if self.state == OPEN:
+                remaining = self.opened_at + self.reset_timeout - now
+                if remaining > 0:
+                    return remaining
+                self.state = HALF_OPEN
+                self.probe_started_at = now
+                return 0.0
+
+            # half_open: una sola prueba a la vez; si la prueba no informó su
+            # resultado en reset_timeout se permite otra
+            if now - self.probe_started_at >= self.reset_timeout:
+                self.probe_started_at = now
+                return 0.0
+            return max(1.0, self.probe_started_at + self.reset_timeout - now)
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    """Un circuit breaker por proceso y por base URL del proveedor"""
+
+    _breakers: Dict[Hashable, CircuitBreaker] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(
+        cls, key: Hashable, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> CircuitBreaker:
+        with cls._lock:
+            breaker = cls._breakers.get(key)
+            if breaker is None:
+                breaker = cls._breakers[key] = CircuitBreaker(
+                    failure_threshold, reset_timeout
+                )
+            else:
+                breaker.failure_threshold = max(1, failure_threshold)
+                breaker.reset_timeout = reset_timeout
+            return breaker
@@ -1,7 +1,8 @@
 from .provider_type import ProviderType
 from .provider import Provider
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional, Tuple
 from .chat_provider_config import ChatProviderConfig
+from .http_pool import HttpPoolConfig
 
 
 class HeynowProvider(Provider):
@@ -75,15 +76,65 @@ class HeynowProvider(Provider):
             "idMessageHey": message.message_id_provider_chat,
         }
         if message.attachment_ids:
-            attachment = message.attachment_ids[0]
-            payload["file"] = {
-                "data": attachment.datas,
+            payload["file"] = self._get_file_payload(message.attachment_ids[0])
+
+        return payload
+
+    def get_payloads(
+        self, message, sent_keys: frozenset = frozenset()
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Send every attachment of the message: the first one goes with the
+        text, the rest in one call each with a derived idMessageHey. Parts
+        whose idMessageHey is in ``sent_keys`` are not built again.
+
+        :param message: Odoo message object
+        :param sent_keys: idMessageHey of the parts already accepted
+        :return: Iterator of payload dictionaries
+        """
+        message_id = message.message_id_provider_chat
+        if not message_id or message_id not in sent_keys:
+            yield self.get_payload(message)
+        for index, attachment in enumerate(message.attachment_ids[1:], start=1):
+            part_id = f"{message_id}-{index}"
+            if message_id and part_id in sent_keys:
+                continue
+            yield {
+                "text": "",
+                "partnerUser": self._get_partner_user(),
+                "idMessageHey": part_id,
+                "file": self._get_file_payload(attachment),
+            }
+
+    def get_payload_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Parts are identified by their idMessageHey.
+
+        :param payload: Payload dictionary
+        :return: idMessageHey, or None when the message has none
+        """
+        return payload.get("idMessageHey") or None
+
+    def _get_file_payload(self, attachment) -> Dict[str, Any]:
+        """
+        config_extra["media_mode"]: "inline" (base64 en el JSON, por defecto)
+        o "url" (URL firmada válida media_url_ttl segundos).
+        """
+        config_extra = self._get_config_extra()
+        if config_extra.get("media_mode") == "url":
+            ttl = int(config_extra.get("media_url_ttl") or 900)
+            return {
+                "url": attachment.sudo()._get_chat_media_signed_url(ttl),
                 "name": attachment.name,
-                "encode": "base64",
+                "encode": "url",
                 "mimeType": attachment.mimetype,
             }
-
-        return payload
+        return {
+            "data": attachment.datas,
+            "name": attachment.name,
+            "encode": "base64",
+            "mimeType": attachment.mimetype,
+        }
 
     def _get_auth_token(self) -> str:
         token = ""
@@ -126,6 +177,62 @@ class HeynowProvider(Provider):
 
         return {}
 
+    def get_http_config(self) -> HttpPoolConfig:
+        """
+        Get the HTTP pool configuration from config_extra["http"].
+
+        :return: HttpPoolConfig instance
+        """
+        return HttpPoolConfig.from_dict(self._get_config_extra().get("http"))
+
+    def get_rate_limit(self) -> Tuple[float, float]:
+        """
+        Get the rate limit from config_extra["rate_limit"] ({"rate", "burst"}).
+
+        :return: (messages per second, burst)
+        """
+        rate_limit = self._get_config_extra().get("rate_limit") or {}
+        return (
+            float(rate_limit.get("rate") or 0),
+            float(rate_limit.get("burst") or 0),
+        )
+
+    def get_rate_limit_key(self):
+        """
+        One bucket per chat.provider record.
+
+        :return: Key of the shared bucket
+        """
+        if not self._provider_config:
+            self._provider_config = self.get_provider_config()
+        return f"chat.provider:{self._provider_config.id}"
+
+    def get_circuit_breaker_config(self) -> Tuple[int, float]:
+        """
+        Get the circuit breaker settings from config_extra["circuit_breaker"]
+        ({"failure_threshold", "reset_timeout"}).
+
+        :return: (consecutive failures before opening, seconds open)
+        """
+        breaker = self._get_config_extra().get("circuit_breaker") or {}
+        return (
+            int(breaker.get("failure_threshold") or 5),
+            float(breaker.get("reset_timeout") or 30),
+        )
+
+    def get_coalesce_window(self) -> float:
+        """
+        Get the coalescing window from config_extra["coalesce_window"].
+
+        :return: Seconds; 0 disables coalescing
+        """
+        return float(self._get_config_extra().get("coalesce_window") or 0)
+
+    def _get_config_extra(self) -> Dict[str, Any]:
+        if not self._provider_config:
+            self._provider_config = self.get_provider_config()
+        return self._provider_config.config_extra or {}
+
     def _clean_html(self, body) -> str:
         return self.clear_html_message(body)
 
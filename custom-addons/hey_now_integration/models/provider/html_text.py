@@ -0,0 +1,135 @@
+from html import unescape
+from html.parser import HTMLParser
+from typing import List
+import re
+
+# Etiquetas cuyo contenido no es texto visible
+SKIPPED_TAGS = ("script", "style")
+
+# Marcas que separan textos: comentarios, CDATA, declaraciones, etiquetas y
+# etiquetas de cierre inválidas (que HTMLParser trata como comentarios)
+MARKUP_RE = re.compile(
+    r"<(?:"
+    r"!--.*?--\s*>"
+    r"|!\[CDATA\[(?P<cdata>.*?)\]\]>"
+    r"|(?P<unclosed>!--)"
+    r"|[!?][^>]*>"
+    r"|/(?![a-zA-Z])[^>]*>"
+    r"|(?P<end>/)?(?P<tag>[a-zA-Z][^\s/>]*)(?:[^>\"']|\"[^\"]*\"|'[^']*')*>"
+    r")",
+    re.S,
+)
+SKIPPED_END_RE = {tag: re.compile(r"</%s\s*>" % tag, re.I) for tag in SKIPPED_TAGS}
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Recorre el HTML en streaming sin construir un árbol. Cada etiqueta o
+    comentario separa los textos con un espacio, igual que
+    BeautifulSoup.get_text(separator=" ").
+    """
+
+    def __init__(self):
+        # Sin convert_charrefs, como BeautifulSoup: el texto que queda tras
+        # una marca sin cerrar se emite como datos en close()
+        super().__init__(convert_charrefs=False)
+        self.parts: List[str] = []
+        self.skip_tag = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_tag is None and tag in SKIPPED_TAGS:
+            self.skip_tag = tag
+        self.parts.append(" ")
+
+    def handle_startendtag(self, tag, attrs):
+        self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag == self.skip_tag:
+            self.skip_tag = None
+        self.parts.append(" ")
+
+    def handle_comment(self, data):
+        self.parts.append(" ")
+
+    def handle_decl(self, decl):
+        self.parts.append(" ")
+
+    def handle_pi(self, data):
+        self.parts.append(" ")
+
+    def unknown_decl(self, data):
+        # BeautifulSoup incluye el contenido de las secciones CDATA
+        if data.startswith("CDATA[") and self.skip_tag is None:
+            self.parts.extend((" ", data[6:], " "))
+        else:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if self.skip_tag is None:
+            self.parts.append(data)
+
+    def handle_charref(self, name):
+        self.handle_data(unescape(f"&#{name};"))
+
+    def handle_entityref(self, name):
+        text = unescape(f"&{name};")
+        # Las entidades desconocidas se conservan como texto
+        self.handle_data(f"&{name}" if text == f"&{name};" else text)
+
+
+def _scan_text_parts(body: str):
+    """
+    Extraer los textos con una sola expresión regular. Retorna None si el
+    HTML está mal cerrado (comentario o script sin cierre) y hace falta el
+    parser completo para reproducir su recuperación de errores.
+    """
+    parts = []
+    pos = 0
+    for match in MARKUP_RE.finditer(body):
+        start = match.start()
+        if start < pos:
+            # Dentro de un script/style ya saltado
+            continue
+        if match.group("unclosed"):
+            return None
+        parts.append(unescape(body[pos:start]))
+        parts.append(" ")
+        pos = match.end()
+
+        if match.group("cdata") is not None:
+            parts.append(match.group("cdata"))
+            parts.append(" ")
+
+        tag = match.group("tag")
+        if tag and not match.group("end") and tag.lower() in SKIPPED_END_RE:
+            end = SKIPPED_END_RE[tag.lower()].search(body, pos)
+            if not end:
+                return None
+            pos = end.end()
+
+    parts.append(unescape(body[pos:]))
+    return parts
+
+
+def html_to_text(body) -> str:
+    """
+    Convierte el HTML de mail.message.body en texto plano de una línea:
+    sin etiquetas, imágenes, scripts ni estilos y con los espacios
+    colapsados. Produce el mismo texto que la versión con BeautifulSoup
+    (scripts/benchmark_html_to_text.py) sin construir el árbol.
+    """
+    if not body:
+        return ""
+
+    body = str(body)
+    if "<" not in body and "&" not in body:
+        return " ".join(body.split())
+
+    parts = _scan_text_parts(body)
+    if parts is None:
+        parser = _TextExtractor()
+        parser.feed(body)
+        parser.close()
+        parts = parser.parts
+    return " ".join("".join(parts).split())
@@ -0,0 +1,117 @@
+from dataclasses import dataclass, fields as dataclass_fields
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from odoo.tools import str2bool
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class HttpPoolConfig:
+    """Configuración del pool HTTP de un proveedor (config_extra["http"])"""
+
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+    keep_alive: bool = True
+    # Reintentos de urllib3: solo conexiones fallidas y métodos idempotentes
+    max_retries: int = 2
+    backoff_factor: float = 0.3
+    connect_timeout: float = 5.0
+    read_timeout: float = 10.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "HttpPoolConfig":
+        """
+        Crear desde un diccionario ignorando claves desconocidas. Un valor
+        que no se puede convertir se registra y se usa el valor por defecto.
+        """
+        if not data or not isinstance(data, dict):
+            return cls()
+        values = {}
+        for field in dataclass_fields(cls):
+            value = data.get(field.name)
+            if value is None:
+                continue
+            try:
+                if field.type is bool and isinstance(value, str):
+                    # bool("false") sería True
+                    values[field.name] = str2bool(value)
+                else:
+                    values[field.name] = field.type(value)
+            except (TypeError, ValueError):
+                _logger.warning(
+                    "Invalid HTTP pool setting %s=%r, using default %r",
+                    field.name,
+                    value,
+                    field.default,
+                )
+        return cls(**values)
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+
+class HttpSessionPool:
+    """
+    Sesiones requests compartidas por proceso, una por origen (esquema y
+    host de la base_url) y configuración. Mantienen las conexiones TCP/TLS
+    abiertas entre mensajes en lugar de negociarlas en cada llamada.
+    """
+
+    _sessions: Dict[Tuple[str, HttpPoolConfig], requests.Session] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_origin(url: str) -> str:
+        parts = urlsplit(url or "")
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    @classmethod
+    def get_session(
+        cls, base_url: str, config: Optional[HttpPoolConfig] = None
+    ) -> requests.Session:
+        config = config or HttpPoolConfig()
+        key = (cls.get_origin(base_url), config)
+        session = cls._sessions.get(key)
+        if session is None:
+            with cls._lock:
+                session = cls._sessions.get(key)
+                if session is None:
+                    session = cls._sessions[key] = cls._build_session(config)
+        return session
+
+    @staticmethod
+    def _build_session(config: HttpPoolConfig) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            max_retries=Retry(
+                total=config.max_retries,
+                connect=config.max_retries,
+                read=0,
+                status=0,
+                backoff_factor=config.backoff_factor,
+            ),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not config.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    @classmethod
+    def close_all(cls):
+        """Cerrar todas las sesiones (p. ej. tras cambiar la configuración)"""
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
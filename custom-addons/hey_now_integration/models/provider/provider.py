@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from .chat_provider_config import ChatProviderConfig
+from .http_pool import HttpPoolConfig, HttpSessionPool
+from .circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from .html_text import html_to_text
 
 
 class Provider(ABC):
@@ -42,37 +45,133 @@ class Provider(ABC):
         """
         pass
 
-    @classmethod
-    def clear_html_message(self, body) -> str:
+    def get_payloads(
+        self, message: Any, sent_keys: frozenset = frozenset()
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Convierte el contenido HTML del mail.message.body en texto plano apto para WhatsApp.
+        Get the payloads (one API call each) needed to send a message. They
+        are built lazily so only one attachment is held in memory at a time.
+
+        :param message: Odoo message object
+        :param sent_keys: Keys (get_payload_key) of the payloads accepted on a
+            previous attempt; they may be skipped without building them
+        :return: Iterator of payload dictionaries
         """
-        from bs4 import BeautifulSoup
-        from markupsafe import Markup
+        yield self.get_payload(message)
 
-        if isinstance(body, Markup):
-            body = str(body)
+    def get_payload_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the key identifying a payload among the calls of a message, used
+        to skip the ones already accepted when the send is retried.
 
-        soup = BeautifulSoup(body, "html.parser")
+        :param payload: Payload dictionary
+        :return: Key, or None when the payloads cannot be told apart
+        """
+        return None
 
-        # Eliminar imágenes (emojis, stickers, etc.)
-        for img in soup.find_all("img"):
-            img.decompose()
+    def get_http_config(self) -> HttpPoolConfig:
+        """
+        Get the HTTP pool configuration (pool size, keep-alive, retries and
+        timeouts) for the provider.
+
+        :return: HttpPoolConfig instance
+        """
+        return HttpPoolConfig()
 
-        # Eliminar elementos de formato innecesarios
-        for tag in soup(["script", "style"]):
-            tag.decompose()
+    def get_session(self, url: str):
+        """
+        Get the shared keep-alive session for the provider host.
 
-        # Eliminar spans y elementos vacíos o con datos técnicos
-        for span in soup.find_all("span"):
-            if not span.get_text(strip=True):
-                span.decompose()
+        :param url: Any URL of the provider, used as pool key
+        :return: requests.Session
+        """
+        return HttpSessionPool.get_session(url, self.get_http_config())
 
-        # Convertir a texto plano
-        text = soup.get_text(separator=" ", strip=True)
+    def post(self, url: str, **kwargs):
+        """
+        Send a POST request through the provider connection pool.
+
+        :param url: Complete URL
+        :return: requests.Response
+        """
+        kwargs.setdefault("timeout", self.get_http_config().timeout)
+        return self.get_session(url).post(url, **kwargs)
+
+    def get_rate_limit(self) -> Tuple[float, float]:
+        """
+        Get the outbound rate limit of the provider account.
+
+        :return: (messages per second, burst); a rate of 0 disables the limit
+        """
+        return (0.0, 0.0)
+
+    def get_rate_limit_key(self):
+        """
+        Get the key identifying the provider account for rate limiting.
+
+        :return: Key of the shared bucket (chat.provider.rate.bucket)
+        """
+        return type(self).__name__
+
+    def acquire_send_slot(self) -> float:
+        """
+        Take a token from the provider account bucket. The bucket is stored
+        in the database, so the rate holds across all Odoo workers.
 
-        # Limpiar múltiples espacios
-        return " ".join(text.split())
+        :return: 0 when the message can be sent now, otherwise seconds to wait
+        """
+        rate, burst = self.get_rate_limit()
+        return self.env["chat.provider.rate.bucket"].try_acquire(
+            self.get_rate_limit_key(), rate, burst or max(rate, 1.0)
+        )
+
+    def get_circuit_breaker_config(self) -> Tuple[int, float]:
+        """
+        Get the circuit breaker settings of the provider endpoint.
+
+        :return: (consecutive failures before opening, seconds open)
+        """
+        return (5, 30.0)
+
+    def get_circuit_breaker(self, url: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker shared by every send to the provider base URL.
+
+        :param url: Any URL of the provider, used as breaker key
+        :return: CircuitBreaker instance
+        """
+        failure_threshold, reset_timeout = self.get_circuit_breaker_config()
+        return CircuitBreakerRegistry.get(
+            HttpSessionPool.get_origin(url), failure_threshold, reset_timeout
+        )
+
+    def get_coalesce_window(self) -> float:
+        """
+        Get the window (seconds) in which consecutive text messages of a
+        conversation may be sent in a single API call.
+
+        :return: Seconds; 0 when the provider does not allow coalescing
+        """
+        return 0.0
+
+    def get_coalesced_payload(self, messages: List[Any]) -> Dict[str, Any]:
+        """
+        Get a single payload for several consecutive text messages.
+
+        :param messages: Odoo mail.message records, oldest first
+        :return: Dictionary representing the payload
+        """
+        payload = self.get_payload(messages[0])
+        texts = [self.clear_html_message(message.body) for message in messages]
+        payload["text"] = "\n".join(text for text in texts if text)
+        return payload
+
+    @classmethod
+    def clear_html_message(self, body) -> str:
+        """
+        Convierte el contenido HTML del mail.message.body en texto plano apto para WhatsApp.
+        """
+        return html_to_text(body)
 
     @abstractmethod
     def get_config_provider(self) -> ChatProviderConfig:
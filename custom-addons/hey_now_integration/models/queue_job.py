@@ -0,0 +1,28 @@
+from odoo import models
+
+
+class QueueJob(models.Model):
+    _inherit = "queue.job"
+
+    def write(self, vals):
+        if vals.get("state") == "failed":
+            self._mark_provider_delivery_failed(vals.get("exc_message"))
+        return super().write(vals)
+
+    def _mark_provider_delivery_failed(self, error):
+        """
+        Cuando un envío al proveedor agota sus reintentos, dejar el mensaje
+        en estado fallido con el último error.
+        """
+        for job in self:
+            if (
+                job.model_name != "mail.channel"
+                or job.method_name != "_send_to_provider"
+                or not job.args
+            ):
+                continue
+            message = job.args[0]
+            if message._name == "mail.message" and message.exists():
+                job.records.sudo()._set_delivery_state(
+                    message, "failed", error or job.exc_message
+                )
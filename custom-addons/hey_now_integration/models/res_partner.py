@@ -1,4 +1,7 @@
-from odoo import models, fields
+from odoo import models, fields, api, tools
+from odoo.exceptions import MissingError
+from odoo.addons.queue_job.exception import RetryableJobError
+from psycopg2.errors import UniqueViolation
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -28,7 +31,9 @@ class ResPartner(models.Model):
     def find_or_create_partner(self, provider_data: object) -> "res.partner":
         """
         Busca un partner existente por ID de usuario del proveedor o crea uno nuevo si no existe.
-        Optimizado para evitar conflictos de concurrencia.
+        Los clientes que vuelven se resuelven desde la caché sin consultar la
+        base; la creación es atómica sobre la restricción unique_provider_user_id:
+        si otro job crea el mismo partner a la vez, este se reintenta.
         """
         provider_user_id = provider_data.get("user_id")
         provider_name = provider_data.get("provider_name")
@@ -39,83 +44,86 @@ class ResPartner(models.Model):
         if not provider_user_id:
             raise ValueError("provider_user_id is required")
 
-        # Usar FOR UPDATE para evitar condiciones de carrera en la búsqueda
         try:
-            self.env.cr.execute(
-                """
-                SELECT id FROM res_partner 
-                WHERE provider_user_id = %s 
-                ORDER BY id DESC 
-                LIMIT 1
-                FOR UPDATE NOWAIT
-            """,
-                (provider_user_id,),
-            )
-
-            result = self.env.cr.fetchone()
-            if result:
-                partner = self.sudo().browse(result[0])
-
-                # Asegurar que el flag esté activado y actualizar datos si es necesario
-                updates = {}
-                if not partner.is_provider_chat_user:
-                    updates["is_provider_chat_user"] = True
-
-                if updates:
-                    partner.write(updates)
-                    _logger.info(f"Updated partner {partner.id} with: {updates}")
-
-                return partner
-
-        except Exception as e:
-            _logger.warning(f"Error in partner lookup with lock: {e}")
-            # Fallback a búsqueda normal
-            partner = self.search(
-                [
-                    ("provider_user_id", "=", provider_user_id),
-                ],
-                limit=1,
-            )
-
-            if partner:
-                # Asegurar que el flag esté activado si ya existía
-                if not partner.is_provider_chat_user:
-                    partner.write({"is_provider_chat_user": True})
-                return partner
-
-        # Si no existe, crear nuevo partner
-        try:
-            partner = self.sudo().create(
-                {
-                    "name": f"{provider_user_name}",
-                    "provider_user_id": provider_user_id,
-                    "provider_name": provider_name,
-                    "is_provider_chat_user": True,
-                }
-            )
-            _logger.info(
-                f"Created new partner {partner.id} for provider_user_id {provider_user_id}"
+            partner_id, is_provider_chat_user = self._get_provider_partner_id(
+                provider_user_id
             )
+        except MissingError:
+            pass
+        else:
+            partner = self.sudo().browse(partner_id)
+            if not is_provider_chat_user:
+                # Asegurar que el flag esté activado si ya existía (write
+                # limpia la caché)
+                partner.write({"is_provider_chat_user": True})
+                _logger.info(
+                    "Updated partner %s with is_provider_chat_user", partner_id
+                )
             return partner
 
-        except Exception as e:
-            _logger.error(f"Error creating partner: {e}")
-
-            # Puede que otro proceso haya creado el partner mientras tanto
-            # Intentar buscar de nuevo
-            partner = self.sudo().search(
-                [
-                    ("provider_user_id", "=", provider_user_id),
-                ],
-                limit=1,
-            )
+        # Si no existe, crear nuevo partner. Si otro job lo crea a la vez, la
+        # restricción única falla solo dentro del savepoint. Su fila no es
+        # visible en esta transacción (REPEATABLE READ): se reintenta el job y
+        # la siguiente búsqueda la encuentra
+        try:
+            with self.env.cr.savepoint(flush=False):
+                partner = self.sudo().create(
+                    {
+                        "name": f"{provider_user_name}",
+                        "provider_user_id": provider_user_id,
+                        "provider_name": provider_name,
+                        "is_provider_chat_user": True,
+                    }
+                )
+        except UniqueViolation as e:
+            raise RetryableJobError(
+                f"Partner for provider user {provider_user_id} created concurrently",
+                seconds=1,
+            ) from e
+        # Si la transacción se deshace, la caché no debe conservar su id
+        self.env.cr.postrollback.add(self.env.registry.clear_caches)
+
+        _logger.info(
+            "Created new partner %s for provider_user_id %s",
+            partner.id,
+            provider_user_id,
+        )
+        return partner
 
-            if partner:
-                _logger.info(f"Found partner {partner.id} created by another process")
-                return partner
-            else:
-                # Si aún no existe, re-lanzar la excepción
-                raise
+    @api.model
+    @tools.ormcache("provider_user_id")
+    def _get_provider_partner_id(self, provider_user_id: str):
+        """
+        (ID, is_provider_chat_user) del partner del usuario del proveedor
+        (caché LRU de ormcache). Solo lee: si no existe lanza MissingError, que
+        no se guarda en caché.
+        """
+        self.env.cr.execute(
+            """
+            SELECT id, is_provider_chat_user FROM res_partner
+            WHERE provider_user_id = %s
+        """,
+            (provider_user_id,),
+        )
+        result = self.env.cr.fetchone()
+        if not result:
+            raise MissingError(f"No partner for provider user {provider_user_id}")
+
+        return tuple(result)
+
+    def write(self, vals):
+        res = super().write(vals)
+        # La fusión de contactos mueve provider_user_id al partner destino
+        if "provider_user_id" in vals or "is_provider_chat_user" in vals:
+            self.clear_caches()
+        return res
+
+    def unlink(self):
+        has_provider_users = any(self.mapped("provider_user_id"))
+        res = super().unlink()
+        if has_provider_users:
+            self.clear_caches()
+        return res
 
     _sql_constraints = [
         (
@@ -1,12 +1,55 @@
 from typing import List
+import functools
+import os
+import time
+
+from psycopg2.errors import UniqueViolation
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
+from odoo.addons.queue_job.exception import RetryableJobError
+from odoo.addons.queue_job.job import Job
 import logging
 from .payloads.dispatcher import WebhookDispatcher
 from .payloads.base_event import FileEvent, BaseEvent
+from .media.downloader import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_TIMEOUT,
+    DownloadedFile,
+    MediaDownloader,
+)
+from .media.streaming import (
+    DEFAULT_MAX_SIZE,
+    MediaTooLargeError,
+    decode_base64_to_file,
+    remove_file,
+)
+from .log_events import log_message_event
+from .admission import BacklogGauge, get_admission_status
 
 _logger = logging.getLogger(__name__)
 
+# Base64 más largo que esto (caracteres) se extrae del payload al recibirlo
+DEFAULT_OFFLOAD_THRESHOLD = 16 * 1024
+# Opciones de los jobs de webhooks entrantes
+WEBHOOK_JOB_OPTIONS = {
+    "priority": 5,  # Prioridad alta para webhooks
+    "max_retries": 3,  # Reintentos automáticos
+    "channel": "webhook.processing",  # Canal específico para webhooks
+}
+# Control de admisión: jobs de webhooks pendientes a partir de los cuales se
+# responde 429 (blando) o 503 (duro) con Retry-After
+DEFAULT_BACKLOG_SOFT_LIMIT = 5000
+DEFAULT_BACKLOG_HARD_LIMIT = 20000
+DEFAULT_BACKLOG_RETRY_AFTER = 30
+BACKLOG_GAUGE_TTL = 2.0
+# Cómo se encolan los webhooks: "queue_job" (un job por evento) o "inbox"
+# (una fila en chat.webhook.inbox consumida por cron)
+WEBHOOK_INGEST_MODES = ("queue_job", "inbox")
+# Archivos con URL: "eager" los descarga al procesar el webhook, "lazy" crea
+# el adjunto solo con la URL y lo descarga después (job o primer acceso)
+MEDIA_FETCH_MODES = ("eager", "lazy")
+
 
 class WebhookProcessor(models.Model):
     _name = "webhook.processor"
@@ -14,89 +57,225 @@ class WebhookProcessor(models.Model):
 
     name = fields.Char(string="Name", default="Webhook Processor")
 
-    def process_webhook_event(self, provider_name: str, payload_data):
+    def process_webhook_event(
+        self, provider_name: str, payload_data, received_at=None, enqueued_at=None
+    ):
         """
         Procesar evento de webhook con protección mejorada contra duplicados.
+        received_at y enqueued_at son las marcas de tiempo del controlador
+        para medir la latencia de extremo a extremo.
         """
+        job_start = time.time()
 
-        with self.env.cr.savepoint():
+        try:
+            dispatcher_webhook = WebhookDispatcher(provider_name, payload_data)
+            payload = dispatcher_webhook.extract_event()
+            payload.timings.update(
+                received=received_at, enqueued=enqueued_at, job_start=job_start
+            )
+
+            if not payload.is_incoming:
+
+                return {"status": "skipped", "message": "Not an incoming message"}
+
+            message_id = payload.message.message_id_provider_chat
+
+            # ✅ VERIFICACIÓN MEJORADA DE DUPLICADOS
+            if message_id:
+                # Sondeo por índice, evita descargar archivos de duplicados
+                if self._find_processed_message_id(message_id):
+                    log_message_event(
+                        self.env,
+                        _logger,
+                        "webhook.duplicate",
+                        provider=provider_name,
+                        message_id=message_id,
+                    )
+                    self.env["chat.message.counter"].increment(
+                        provider_name, "duplicate", payload.channel
+                    )
+                    return {
+                        "status": "duplicate",
+                        "message": "Message already processed",
+                        "message_id": message_id,
+                    }
+
+            # Descargar los archivos antes de tocar la base de datos, así el
+            # savepoint solo dura lo que tarda insertar los registros
             try:
-                dispatcher_webhook = WebhookDispatcher(provider_name, payload_data)
-                payload = dispatcher_webhook.extract_event()
-
-                if not payload.is_incoming:
-
-                    return {"status": "skipped", "message": "Not an incoming message"}
-
-                message_id = payload.message.message_id_provider_chat
-
-                # ✅ VERIFICACIÓN MEJORADA DE DUPLICADOS
-                if message_id:
-                    # Verificar si ya existe con lock
-                    if self._check_and_lock_duplicate(message_id):
-                        _logger.info(
-                            "Duplicate message detected and skipped: %s", message_id
-                        )
-                        return {
-                            "status": "duplicate",
-                            "message": "Message already processed",
-                            "message_id": message_id,
-                        }
-
-                # Procesar el webhook
-                result = self._process_webhook_core(
-                    provider_name,
-                    payload.user_id,
-                    payload.message,
-                    payload.channel_name or provider_name,
-                    payload.user_name,
-                    payload,
-                )
+                payload.timings["download_start"] = time.time()
+                self._resolve_known_media(provider_name, payload.message.files)
+                self._prefetch_message_files(payload.message.files)
+                payload.timings["downloaded"] = time.time()
+
+                with self.env.cr.savepoint():
+                    # Procesar el webhook
+                    result = self._process_webhook_core(
+                        provider_name,
+                        payload.user_id,
+                        payload.message,
+                        payload.channel_name or provider_name,
+                        payload.user_name,
+                        payload,
+                    )
+            finally:
+                self._discard_local_files(payload.message.files)
 
-                return result
+            self.env["chat.message.counter"].increment(
+                provider_name,
+                "received" if result.get("status") == "success" else "duplicate",
+                payload.channel,
+            )
+            if result.get("status") == "success":
+                self.env["chat.message.latency"].record(provider_name, payload.timings)
+            return result
 
-            except ValueError as e:
-                _logger.error("Validation error processing webhook: %s", str(e))
-                raise
-            except Exception as e:
-                _logger.error("Unexpected error processing webhook: %s", str(e))
-                raise
+        except RetryableJobError:
+            raise
+        except ValueError as e:
+            _logger.error("Validation error processing webhook: %s", str(e))
+            raise
+        except Exception as e:
+            _logger.error("Unexpected error processing webhook: %s", str(e))
+            raise
 
-    def _check_and_lock_duplicate(self, message_id_provider_chat):
+    @api.model
+    def _enqueue_webhook_events(self, provider_name: str, events, received_at=None):
         """
-        Verificar duplicados con bloqueo de fila para evitar condiciones de carrera.
-        Retorna True si es duplicado, False si es nuevo.
+        Encolar varios webhooks con un solo INSERT en queue_job. Retorna los
+        UUID de los jobs en el mismo orden que ``events``.
         """
-        if not message_id_provider_chat:
-            return False
-
-        try:
-            # Intentar obtener un lock exclusivo en la fila si existe
-            self.env.cr.execute(
-                """
-                SELECT id FROM mail_message
-                WHERE message_id_provider_chat = %s
-                FOR UPDATE NOWAIT
-            """,
-                (message_id_provider_chat,),
+        enqueued_at = time.time()
+        kwargs = {"received_at": received_at, "enqueued_at": enqueued_at}
+
+        # En modo sin cola (tests) se mantiene el camino normal de with_delay
+        if self.env.context.get("queue_job__no_delay"):
+            return [
+                self.with_delay(**WEBHOOK_JOB_OPTIONS)
+                .process_webhook_event(provider_name, data, **kwargs)
+                .uuid
+                for data in events
+            ]
+
+        jobs = [
+            Job(
+                self.process_webhook_event,
+                args=(provider_name, data),
+                kwargs=kwargs,
+                **WEBHOOK_JOB_OPTIONS,
             )
+            for data in events
+        ]
+        job_model = self.env["queue.job"]
+        job_model = job_model.with_context(_job_edit_sentinel=job_model.EDIT_SENTINEL)
+        job_model.sudo().create([job._store_values(create=True) for job in jobs])
+        return [job.uuid for job in jobs]
 
-            result = self.env.cr.fetchone()
-            if result:
-                # Ya existe el mensaje
-                return True
+    @api.model
+    def _count_webhook_backlog(self, limit: int) -> int:
+        """
+        Jobs de webhooks aún sin ejecutar más mensajes pendientes de la
+        bandeja de entrada, contados como mucho hasta ``limit`` cada uno: por
+        encima del límite duro el número exacto no importa y la consulta no
+        recorre toda la cola.
+        """
+        self.env.cr.execute(
+            """
+            SELECT count(*) FROM (
+                SELECT 1 FROM queue_job
+                WHERE state IN ('pending', 'enqueued')
+                  AND model_name = %s AND method_name = 'process_webhook_event'
+                LIMIT %s
+            ) AS backlog
+        """,
+            (self._name, limit),
+        )
+        backlog = self.env.cr.fetchone()[0]
+        return backlog + self.env["chat.webhook.inbox"]._count_pending(limit)
 
-            # No existe, continuamos con el procesamiento
-            return False
+    @api.model
+    def _get_webhook_ingest_mode(self) -> str:
+        mode = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hey_now_integration.webhook_ingest_mode", "queue_job")
+        )
+        return mode if mode in WEBHOOK_INGEST_MODES else "queue_job"
 
-        except Exception as e:
-            # Si hay error obteniendo el lock, probablemente otro proceso lo está procesando
-            _logger.warning(
-                "Could not acquire lock for message %s: %s",
-                message_id_provider_chat,
-                str(e),
+    @api.model
+    def _get_webhook_backlog(self, limit: int) -> int:
+        """Tamaño de la cola de webhooks, cacheado unos segundos por proceso"""
+        return BacklogGauge.get(
+            (self.env.cr.dbname, limit),
+            BACKLOG_GAUGE_TTL,
+            lambda: self._count_webhook_backlog(limit),
+        )
+
+    @api.model
+    def _check_webhook_admission(self, provider_name=None):
+        """
+        Decidir si se acepta un webhook según la cola pendiente. Retorna
+        None si se acepta o (código HTTP, segundos de Retry-After).
+        """
+        params = self.env["ir.config_parameter"].sudo()
+        soft_limit = int(
+            params.get_param(
+                "hey_now_integration.webhook_backlog_soft_limit",
+                DEFAULT_BACKLOG_SOFT_LIMIT,
             )
-            return True  # Asumir duplicado para evitar procesamiento concurrente
+        )
+        hard_limit = int(
+            params.get_param(
+                "hey_now_integration.webhook_backlog_hard_limit",
+                DEFAULT_BACKLOG_HARD_LIMIT,
+            )
+        )
+        if not soft_limit and not hard_limit:
+            return None
+
+        backlog = self._get_webhook_backlog(max(soft_limit, hard_limit))
+        status = get_admission_status(backlog, soft_limit, hard_limit)
+        if status is None:
+            return None
+
+        retry_after = int(
+            params.get_param(
+                "hey_now_integration.webhook_backlog_retry_after",
+                DEFAULT_BACKLOG_RETRY_AFTER,
+            )
+        )
+        log_message_event(
+            self.env,
+            _logger,
+            "webhook.throttled",
+            provider=provider_name,
+            status=status,
+            backlog=backlog,
+            retry_after=retry_after,
+        )
+        return status, retry_after
+
+    def _find_processed_message_id(self, message_id_provider_chat):
+        """
+        Buscar un mensaje de webhook ya procesado con este ID del proveedor.
+        Es una sola consulta sobre el índice único parcial, sin bloqueos: la
+        garantía contra condiciones de carrera la da el propio índice al
+        insertar (ver _create_message_with_final_check).
+        Retorna el ID del mensaje existente o None.
+        """
+        if not message_id_provider_chat:
+            return None
+
+        self.env.cr.execute(
+            """
+            SELECT id FROM mail_message
+            WHERE message_id_provider_chat = %s AND is_from_webhook
+            LIMIT 1
+        """,
+            (message_id_provider_chat,),
+        )
+        result = self.env.cr.fetchone()
+        return result[0] if result else None
 
     def _process_webhook_core(
         self, provider_name, user_id, message, channel_name, user_name, payload
@@ -133,6 +312,7 @@ class WebhookProcessor(models.Model):
             external_channel_id=user_id,
             extra_metadata=payload.metadata or {},
         )
+        payload.timings["resolved"] = time.time()
 
         # Crear mensaje con verificación final
         message_channel = self._create_message_with_final_check(
@@ -155,60 +335,78 @@ class WebhookProcessor(models.Model):
         """
         message_id_provider = getattr(message, "message_id_provider_chat", None)
 
-        # ✅ VERIFICACIÓN FINAL MEJORADA
-        if message_id_provider:
-            # Usar el método mejorado de verificación
-            existing = self.env["mail.message"].check_duplicate_by_provider_id(
-                message_id_provider
-            )
-            if existing:
-
-                return existing
-
         # Crear el mensaje
         try:
             # ✅ PROCESAR ARCHIVOS SI EXISTEN
             message_event = payload.message
             attachment_ids = []
 
-            if hasattr(message_event, "files") and message_event.files:
-                attachment_ids = self._process_message_files(
-                    channel, message_event.files
+            # El savepoint cubre adjuntos y mensaje: si otro job insertó el
+            # mismo ID del proveedor, se descarta todo lo creado aquí.
+            with self.env.cr.savepoint():
+                if hasattr(message_event, "files") and message_event.files:
+                    attachment_ids = self._process_message_files(
+                        channel, message_event.files
+                    )
+                payload.timings["attachments"] = time.time()
+                attachment_models = (
+                    self.env["ir.attachment"].sudo().browse(attachment_ids)
                 )
-            attachment_models = self.env["ir.attachment"].sudo().browse(attachment_ids)
-            body = self.generate_message_body_native(message.content, attachment_models)
-            # ✅ CREAR MENSAJE DE WEBHOOK - SIEMPRE skip_send_to_provider=True
-            message_channel = channel.with_context(
-                skip_send_to_provider=True,  # ✅ NUNCA reenviar mensajes de webhook
-                webhook_source=True,
-            ).message_post(
-                body=body,
-                message_type="comment",
-                subtype_xmlid="mail.mt_comment",
-                author_id=partner.id,
-                attachment_ids=attachment_ids,  # ✅ ARCHIVOS ADJUNTOS
-            )
-
-            # ✅ MARCAR CORRECTAMENTE EL MENSAJE
-            if message_channel:
-                values_to_write = {
-                    "is_from_webhook": True,  # ✅ Marcar como webhook
-                }
-
-                # ✅ SOBRESCRIBIR EL UUID CON EL DEL PROVEEDOR
+                body = self.generate_message_body_native(
+                    message.content, attachment_models
+                )
+                # ✅ CREAR MENSAJE DE WEBHOOK - SIEMPRE skip_send_to_provider=True
+                # El ID del proveedor y la marca de webhook van en el mismo
+                # INSERT, así el índice único resuelve la concurrencia.
+                message_values = {"is_from_webhook": True}
                 if message_id_provider:
-                    values_to_write["message_id_provider_chat"] = message_id_provider
-
-                message_channel.write(values_to_write)
+                    message_values["message_id_provider_chat"] = message_id_provider
+
+                message_channel = channel.with_context(
+                    skip_send_to_provider=True,  # ✅ NUNCA reenviar mensajes de webhook
+                    webhook_source=True,
+                ).message_post(
+                    body=body,
+                    message_type="comment",
+                    subtype_xmlid="mail.mt_comment",
+                    author_id=partner.id,
+                    attachment_ids=attachment_ids,  # ✅ ARCHIVOS ADJUNTOS
+                    **message_values,
+                )
+                payload.timings["posted"] = time.time()
+                # Miniaturas, pósters y medios diferidos en segundo plano
+                # (canal chat.media)
+                attachment_models._enqueue_chat_previews()
+                attachment_models._enqueue_chat_media_fetch()
 
-                _logger.info(
-                    "Created webhook message %s with provider_id: %s",
-                    message_channel.id,
-                    message_id_provider,
+            if message_channel:
+                log_message_event(
+                    self.env,
+                    _logger,
+                    "webhook.processed",
+                    message=message_channel.id,
+                    message_id=message_id_provider,
+                    attachments=len(attachment_ids),
+                    timings=payload.timings,
                 )
 
             return message_channel
 
+        except UniqueViolation as e:
+            # Otro job confirmó el mismo mensaje mientras procesábamos este. La
+            # transacción es REPEATABLE READ: su fila no es visible en esta
+            # instantánea, así que se reintenta y el sondeo inicial de
+            # process_webhook_event lo resuelve como duplicado
+            _logger.info(
+                "Concurrent insert of provider message %s, retrying as duplicate",
+                message_id_provider,
+            )
+            raise RetryableJobError(
+                f"Provider message {message_id_provider} inserted concurrently",
+                seconds=1,
+                ignore_retry=True,
+            ) from e
+
         except Exception as e:
             _logger.error("Error creating message: %s", str(e))
             raise
@@ -217,6 +415,109 @@ class WebhookProcessor(models.Model):
         """Obtener el usuario interno (operador del chat)"""
         return self.env.ref("base.user_admin").sudo().partner_id
 
+    def _get_media_max_size(self) -> int:
+        """Tamaño máximo (bytes) de un archivo entrante; 0 desactiva el límite"""
+        return int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hey_now_integration.media_max_size", DEFAULT_MAX_SIZE)
+        )
+
+    def _get_media_downloader(self) -> MediaDownloader:
+        """Downloader configurado desde los parámetros del sistema"""
+        params = self.env["ir.config_parameter"].sudo()
+        return MediaDownloader(
+            self.env["ir.attachment"].sudo()._get_chat_media_tmp_dir(),
+            max_workers=int(
+                params.get_param(
+                    "hey_now_integration.media_download_workers",
+                    DEFAULT_MAX_WORKERS,
+                )
+            ),
+            timeout=float(
+                params.get_param(
+                    "hey_now_integration.media_download_timeout", DEFAULT_TIMEOUT
+                )
+            ),
+            max_size=self._get_media_max_size(),
+        )
+
+    def _get_media_fetch_mode(self) -> str:
+        mode = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hey_now_integration.media_fetch_mode", "eager")
+        )
+        return mode if mode in MEDIA_FETCH_MODES else "eager"
+
+    def _prefetch_message_files(self, files: List[FileEvent]):
+        """
+        Descargar en paralelo los FileEvent con URL y guardar el resultado en
+        cada evento para que _download_and_create_attachment solo inserte.
+        En modo lazy no se descarga nada aquí.
+        """
+        if not files or self._get_media_fetch_mode() == "lazy":
+            return
+
+        # Los archivos que ya tenemos en el filestore no se descargan
+        pending = [
+            file_event
+            for file_event in files
+            if not file_event.known_attachment_id and not file_event.staged_checksum
+        ]
+        for result in self._get_media_downloader().download_all(pending):
+            self._set_download_result(result)
+
+    def _get_media_keys(self, provider_name: str, file_event: FileEvent) -> List[str]:
+        """
+        Claves con las que el proveedor identifica el archivo, de la más
+        específica a la más general: temporal_id y luego checksum.
+        """
+        keys = []
+        temporal_id = (file_event.metadata or {}).get("temporal_id")
+        if temporal_id:
+            keys.append(f"{provider_name}:temporal:{temporal_id}")
+        if file_event.checksum:
+            keys.append(f"{provider_name}:checksum:{file_event.checksum}")
+        return keys
+
+    def _resolve_known_media(self, provider_name: str, files: List[FileEvent]):
+        """
+        Marcar en cada FileEvent su clave de medio y, si ya fue descargado
+        antes, el attachment existente que se reutilizará.
+        """
+        if not files:
+            return
+
+        keys_by_event = [
+            (file_event, self._get_media_keys(provider_name, file_event))
+            for file_event in files
+        ]
+        known = self.env["ir.attachment"].sudo()._find_chat_media(
+            [key for _event, keys in keys_by_event for key in keys]
+        )
+        for file_event, keys in keys_by_event:
+            file_event.media_key = keys[0] if keys else None
+            for key in keys:
+                if key in known:
+                    file_event.known_attachment_id = known[key].id
+                    break
+
+    def _set_download_result(self, result: DownloadedFile):
+        """Copiar el resultado de la descarga al FileEvent"""
+        file_event = result.file_event
+        file_event.local_path = result.path
+        file_event.local_checksum = result.checksum
+        file_event.local_size = result.size
+        file_event.content_type = result.content_type
+        file_event.download_error = result.error
+
+    def _discard_local_files(self, files: List[FileEvent]):
+        """Eliminar temporales que no terminaron en un attachment"""
+        for file_event in files or []:
+            remove_file(file_event.local_path)
+            file_event.local_path = None
+
     def _process_message_files(self, channel, files: List[FileEvent]) -> List[int]:
         """
         Procesar lista de FileEvent y crear attachments
@@ -236,7 +537,7 @@ class WebhookProcessor(models.Model):
                         "Failed to create attachment for file: %s", file_event.name
                     )
 
-            _logger.info(
+            _logger.debug(
                 "Processed %s files, created %s attachments",
                 len(files),
                 len(attachment_ids),
@@ -251,64 +552,129 @@ class WebhookProcessor(models.Model):
         """Crear ir.attachment desde FileEvent Maneja tanto URLs como datos base64"""
 
         try:
-            # ✅ CASO 1: Si hay URL, descargar archivo
-            if file_event.url:
+            # ✅ CASO 0: Archivo ya recibido antes, reutilizar el contenido
+            if file_event.known_attachment_id:
+                return self._create_attachment_from_known_media(channel, file_event)
+
+            # ✅ CASO 1: base64 extraído al recibir el webhook
+            elif file_event.staged_checksum:
+                return self._create_attachment_from_staged(channel, file_event)
+
+            # ✅ CASO 2a: URL en modo lazy, el adjunto se crea sin contenido
+            elif file_event.url and self._get_media_fetch_mode() == "lazy":
+                return self._create_lazy_url_attachment(channel, file_event)
+
+            # ✅ CASO 2: Si hay URL, descargar archivo
+            elif file_event.url:
                 return self._download_and_create_attachment(file_event, channel)
 
-            # ✅ CASO 2: Si hay datos base64, usar directamente
+            # ✅ CASO 3: Si hay datos base64, usar directamente
             elif file_event.datas:
                 return self._create_attachment_from_data(channel, file_event)
 
             else:
-                _logger.warning("FileEvent sin URL ni datos: %s", file_event.name)
+                _logger.warning(
+                    "FileEvent sin URL ni datos: %s (%s)",
+                    file_event.name,
+                    file_event.download_error,
+                )
                 return False
 
         except Exception as e:
             _logger.error("Error processing FileEvent %s: %s", file_event.name, str(e))
             return False
 
-    def _download_and_create_attachment(self, file_event: FileEvent, channel=None):
-        """Descargar archivo desde URL y crear attachment"""
-        try:
-            import requests
-            from urllib.parse import urlparse
-            import mimetypes
-            import base64
+    def _create_attachment_from_known_media(self, channel, file_event: FileEvent):
+        """Crear attachment enlazado al archivo de una recepción anterior"""
+        attachment_model = self.env["ir.attachment"].sudo()
+        source = attachment_model.browse(file_event.known_attachment_id)
 
-            response = requests.get(file_event.url, timeout=10)
-            response.raise_for_status()
+        attachment = attachment_model._create_from_existing_chat_media(
+            source,
+            {
+                "name": file_event.name or source.name,
+                "res_model": "mail.channel",
+                "res_id": channel.id,
+                "url": file_event.url,
+                "description": file_event.description or source.description,
+                "chat_media_key": file_event.media_key,
+            },
+        )
+        _logger.debug(
+            "Reused stored media %s for file %s -> ID: %s",
+            source.id,
+            file_event.name,
+            attachment.id,
+        )
+        return attachment
 
-            # Convertir a base64
-            file_data_b64 = base64.b64encode(response.content).decode("utf-8")
+    def _get_url_file_name_and_mimetype(self, file_event: FileEvent):
+        """Nombre y mimetype de un FileEvent con URL cuando no vienen en el evento"""
+        from urllib.parse import urlparse
+        import mimetypes
 
-            # Detectar mimetype si no está definido
-            mimetype = file_event.mimetype
+        # Detectar mimetype si no está definido
+        mimetype = file_event.mimetype
+        if not mimetype:
+            mimetype = file_event.content_type
             if not mimetype:
-                mimetype = response.headers.get("content-type")
-                if not mimetype:
-                    mimetype, _ = mimetypes.guess_type(
-                        file_event.url or file_event.name
-                    )
-                    mimetype = mimetype or "application/octet-stream"
+                mimetype, _ = mimetypes.guess_type(file_event.url or file_event.name)
+                mimetype = mimetype or "application/octet-stream"
 
-            # Obtener nombre del archivo si no está definido
-            name = file_event.name
-            if not name:
-                parsed_url = urlparse(file_event.url)
-                path = parsed_url.path
-                if isinstance(path, bytes):
-                    path = path.decode("utf-8", errors="replace")
-                name = path.split("/")[-1] or "archivo_descargado"
+        # Obtener nombre del archivo si no está definido
+        name = file_event.name
+        if not name:
+            parsed_url = urlparse(file_event.url)
+            path = parsed_url.path
+            if isinstance(path, bytes):
+                path = path.decode("utf-8", errors="replace")
+            name = path.split("/")[-1] or "archivo_descargado"
+        return name, mimetype
+
+    def _create_lazy_url_attachment(self, channel, file_event: FileEvent):
+        """
+        Crear el attachment solo con la URL del proveedor: el mensaje aparece
+        sin esperar la descarga, que hace después _fetch_chat_media.
+        """
+        name, mimetype = self._get_url_file_name_and_mimetype(file_event)
+        attachment_data = {
+            "name": name,
+            "type": "binary",
+            "res_model": "mail.channel",
+            "res_id": channel.id if channel else None,
+            "url": file_event.url,
+            "mimetype": mimetype,
+            "chat_media_key": file_event.media_key,
+            "chat_media_pending": True,
+        }
+        if file_event.description:
+            attachment_data["description"] = file_event.description
+        if file_event.access_token:
+            attachment_data["access_token"] = file_event.access_token
+        return self.env["ir.attachment"].sudo().create(attachment_data)
+
+    def _download_and_create_attachment(self, file_event: FileEvent, channel=None):
+        """Crear attachment desde un archivo descargado (o descargarlo si no se hizo)"""
+        try:
+            # Normalmente ya viene descargado por _prefetch_message_files
+            if not file_event.local_path and not file_event.download_error:
+                self._set_download_result(
+                    self._get_media_downloader().download(file_event)
+                )
+
+            if file_event.download_error:
+                raise ValueError(file_event.download_error)
+
+            name, mimetype = self._get_url_file_name_and_mimetype(file_event)
 
             # Crear attachment con todos los campos disponibles
             attachment_data = {
                 "name": name,
-                "type": file_event.type,
-                "datas": file_data_b64,
                 "res_model": "mail.channel",  # ✅ modelo correcto,
                 "url": file_event.url,  # URL original si aplica
                 "res_id": channel.id if channel else None,
                 "mimetype": mimetype,
+                "chat_media_key": file_event.media_key,
             }
 
             # ✅ CAMPOS OPCIONALES DE FileEvent
@@ -316,12 +682,21 @@ class WebhookProcessor(models.Model):
                 attachment_data["description"] = file_event.description
             if file_event.access_token:
                 attachment_data["access_token"] = file_event.access_token
-            if file_event.checksum:
-                attachment_data["checksum"] = file_event.checksum
 
-            attachment = self.env["ir.attachment"].sudo().create(attachment_data)
+            # El archivo pasa del temporal al filestore sin cargarse en memoria
+            attachment = (
+                self.env["ir.attachment"]
+                .sudo()
+                ._create_from_chat_media_file(
+                    file_event.local_path,
+                    file_event.local_checksum,
+                    file_event.local_size,
+                    attachment_data,
+                )
+            )
+            file_event.local_path = None
 
-            _logger.info(
+            _logger.debug(
                 "Downloaded and created attachment from URL: %s -> ID: %s",
                 file_event.url,
                 attachment.id,
@@ -334,19 +709,103 @@ class WebhookProcessor(models.Model):
             )
             return False
 
+    def _create_attachment_from_staged(self, channel, file_event: FileEvent):
+        """Crear attachment desde el archivo guardado al recibir el webhook"""
+        import mimetypes
+
+        attachment_model = self.env["ir.attachment"].sudo()
+        checksum = file_event.staged_checksum
+        path = attachment_model._open_staged_chat_media(checksum)
+        if not path:
+            _logger.error(
+                "Staged media %s for %s is no longer available",
+                checksum,
+                file_event.name,
+            )
+            return False
+
+        mimetype = file_event.mimetype
+        if not mimetype and file_event.name:
+            mimetype, _ = mimetypes.guess_type(file_event.name)
+        attachment_data = {
+            "name": file_event.name or "archivo_webhook",
+            "res_model": "mail.channel",
+            "res_id": channel.id,
+            "url": file_event.url,
+            "mimetype": mimetype or "application/octet-stream",
+            "chat_media_key": file_event.media_key,
+        }
+        if file_event.description:
+            attachment_data["description"] = file_event.description
+        if file_event.access_token:
+            attachment_data["access_token"] = file_event.access_token
+
+        try:
+            attachment = attachment_model._create_from_chat_media_file(
+                path, checksum, os.path.getsize(path), attachment_data
+            )
+        finally:
+            remove_file(path)
+
+        # El archivo en espera se borra solo cuando el mensaje queda
+        # confirmado; si el job falla, el reintento lo vuelve a usar
+        self.env.cr.postcommit.add(
+            functools.partial(
+                remove_file, attachment_model._get_staged_chat_media_path(checksum)
+            )
+        )
+        return attachment
+
+    @api.model
+    def _offload_inline_media(self, provider_name: str, data):
+        """
+        Reemplazar en el payload del webhook los archivos base64 mayores que
+        hey_now_integration.media_offload_threshold por una referencia
+        ``dataRef`` ({checksum, size}) a su copia en disco, así los
+        argumentos del queue.job no llevan el contenido. Solo se recorren las
+        entradas de archivos que indica el parser del proveedor; un archivo
+        que no se puede extraer queda con ``dataError``.
+        """
+        threshold = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "hey_now_integration.media_offload_threshold",
+                DEFAULT_OFFLOAD_THRESHOLD,
+            )
+        )
+        if threshold <= 0:
+            return data
+
+        attachment_model = self.env["ir.attachment"].sudo()
+        max_size = self._get_media_max_size()
+        for file in WebhookDispatcher(provider_name, data).get_media_files():
+            inline = file.get("data")
+            if not isinstance(inline, str) or len(inline) <= threshold:
+                continue
+            try:
+                start = inline.index(",") + 1 if inline.startswith("data:") else 0
+                writer = attachment_model._stage_chat_media(inline, max_size, start)
+                file["dataRef"] = {"checksum": writer.checksum, "size": writer.size}
+            except (MediaTooLargeError, ValueError) as e:
+                file["dataError"] = str(e)
+            del file["data"]
+        return data
+
     def _create_attachment_from_data(self, channel, file_event: FileEvent):
         """Crear attachment desde datos base64 existentes"""
         try:
             import mimetypes
 
-            # Limpiar base64 si viene con prefijo data:
+            # Saltar el prefijo data: sin copiar el string base64
             datas = file_event.datas
+            start = 0
             if datas.startswith("data:"):
                 # Extraer mimetype del data URI si no está definido
+                start = datas.index(",") + 1
                 if not file_event.mimetype:
-                    mimetype_part = datas.split(";")[0].split(":")[1]
+                    mimetype_part = datas[:start].split(";")[0].split(":")[1]
                     file_event.mimetype = mimetype_part
-                datas = datas.split(",")[1]
 
             # Detectar mimetype si no está definido
             mimetype = file_event.mimetype
@@ -354,15 +813,23 @@ class WebhookProcessor(models.Model):
                 mimetype, _ = mimetypes.guess_type(file_event.name)
                 mimetype = mimetype or "application/octet-stream"
 
+            # Decodificar por bloques directamente a un temporal del filestore
+            attachment_model = self.env["ir.attachment"].sudo()
+            writer = decode_base64_to_file(
+                datas,
+                attachment_model._get_chat_media_tmp_dir(),
+                max_size=self._get_media_max_size(),
+                start=start,
+            )
+
             # Crear attachment con todos los campos
             attachment_data = {
                 "name": file_event.name or "archivo_webhook",
-                "type": file_event.type,
-                "datas": datas,
                 "res_model": "mail.channel",  # ✅ modelo correcto,
                 "res_id": channel.id,
                 "url": file_event.url,  # URL original si aplica
                 "mimetype": mimetype,
+                "chat_media_key": file_event.media_key,
             }
 
             # ✅ CAMPOS OPCIONALES DE FileEvent
@@ -370,12 +837,15 @@ class WebhookProcessor(models.Model):
                 attachment_data["description"] = file_event.description
             if file_event.access_token:
                 attachment_data["access_token"] = file_event.access_token
-            if file_event.checksum:
-                attachment_data["checksum"] = file_event.checksum
 
-            attachment = self.env["ir.attachment"].sudo().create(attachment_data)
+            try:
+                attachment = attachment_model._create_from_chat_media_file(
+                    writer.path, writer.checksum, writer.size, attachment_data
+                )
+            finally:
+                remove_file(writer.path)
 
-            _logger.info(
+            _logger.debug(
                 "Created attachment from base64 data: %s -> ID: %s",
                 file_event.name,
                 attachment.id,
@@ -422,71 +892,111 @@ class WebhookProcessor(models.Model):
         # Método adicional para limpiar mensajes duplicados si ya existen
 
     @api.model
-    def cleanup_duplicate_messages(self):
+    def cleanup_duplicate_messages(self, batch_size=1000, dry_run=False):
         """
         Método de utilidad para limpiar mensajes duplicados existentes.
-        Ejecutar manualmente si ya tienes duplicados.
+        Se ejecuta desde el cron o manualmente: cuenta los duplicados y, si
+        hay, encola el primer lote de borrado. Con dry_run solo los cuenta.
         """
-        _logger.info("Starting duplicate cleanup...")
-
-        # Buscar mensajes duplicados
         self.env.cr.execute(
             """
-            SELECT message_id_provider_chat, array_agg(id ORDER BY id) as ids
-            FROM mail_message 
-            WHERE message_id_provider_chat IS NOT NULL
-            GROUP BY message_id_provider_chat
-            HAVING COUNT(*) > 1
+            SELECT COUNT(*), COALESCE(SUM(total - 1), 0)
+            FROM (
+                SELECT COUNT(*) AS total
+                FROM mail_message
+                WHERE message_id_provider_chat IS NOT NULL
+                GROUP BY message_id_provider_chat
+                HAVING COUNT(*) > 1
+            ) AS duplicates
         """
         )
+        groups, messages = self.env.cr.fetchone()
+        _logger.info(
+            "Duplicate messages: %s groups, %s messages to delete%s",
+            groups,
+            messages,
+            " (dry run)" if dry_run else "",
+        )
 
-        duplicates = self.env.cr.fetchall()
-
-        for message_id_provider, ids in duplicates:
-            # Mantener el primer mensaje, eliminar los demás
-            keep_id = ids[0]
-            delete_ids = ids[1:]
-
-            _logger.info(
-                "Found duplicates for %s: keeping %s, deleting %s",
-                message_id_provider,
-                keep_id,
-                delete_ids,
-            )
+        if messages and not dry_run:
+            self._enqueue_cleanup_duplicate_batch(0, batch_size, 0, messages)
+        return {"groups": groups, "messages": messages}
 
-            # Eliminar los duplicados
-            self.env["mail.message"].browse(delete_ids).unlink()
+    def _enqueue_cleanup_duplicate_batch(self, after_id, batch_size, deleted, total):
+        self.with_delay(
+            priority=20,
+            identity_key=f"cleanup_duplicate_messages:{after_id}",
+            description=f"Limpiar mensajes duplicados desde id {after_id}",
+        )._cleanup_duplicate_messages_batch(after_id, batch_size, deleted, total)
 
+    def _cleanup_duplicate_messages_batch(
+        self, after_id=0, batch_size=1000, deleted=0, total=0
+    ):
+        """
+        Borrar un lote de duplicados (todos los mensajes con el mismo
+        message_id_provider_chat salvo el de menor id) y encolar el siguiente.
+        Cada lote es un job con su propia transacción: si uno falla, se
+        reintenta desde su after_id sin repetir los anteriores.
+        """
+        self.env.cr.execute(
+            """
+            SELECT m.id
+            FROM mail_message m
+            WHERE m.message_id_provider_chat IS NOT NULL
+              AND m.id > %s
+              AND EXISTS (
+                  SELECT 1 FROM mail_message original
+                  WHERE original.message_id_provider_chat = m.message_id_provider_chat
+                    AND original.id < m.id
+              )
+            ORDER BY m.id
+            LIMIT %s
+        """,
+            (after_id, batch_size),
+        )
+        delete_ids = [row[0] for row in self.env.cr.fetchall()]
+        if not delete_ids:
+            _logger.info("Duplicate cleanup completed. Deleted %s messages", deleted)
+            return deleted
+
+        # ORM unlink para limpiar notificaciones y adjuntos de los mensajes
+        self.env["mail.message"].sudo().browse(delete_ids).unlink()
+        deleted += len(delete_ids)
         _logger.info(
-            "Duplicate cleanup completed. Processed %s groups", len(duplicates)
+            "Duplicate cleanup: deleted %s/%s messages (last id %s)",
+            deleted,
+            total,
+            delete_ids[-1],
         )
 
+        self._enqueue_cleanup_duplicate_batch(
+            delete_ids[-1], batch_size, deleted, total
+        )
+        return deleted
+
     # Método para obtener estadísticas de procesamiento
     @api.model
-    def get_processing_stats(self):
-        """Obtener estadísticas de procesamiento de webhooks"""
-
-        # Contar mensajes por proveedor
-        self.env.cr.execute(
-            """
-            SELECT 
-                CASE 
-                    WHEN message_id_provider_chat IS NOT NULL THEN 'webhook'
-                    ELSE 'regular'
-                END as source_type,
-                COUNT(*) as count
-            FROM mail_message
-            WHERE create_date >= NOW() - INTERVAL '24 hours'
-            GROUP BY source_type
+    def get_processing_stats(self, hours=24, provider_name=None):
         """
-        )
-
-        stats = dict(self.env.cr.fetchall())
+        Obtener estadísticas de procesamiento de webhooks desde los contadores
+        por minuto (chat.message.counter), por proveedor y canal.
+        """
+        totals = {"received": 0, "duplicate": 0, "sent": 0, "failed": 0}
+        by_provider = {}
+        for provider, channel, event, count in self.env[
+            "chat.message.counter"
+        ].get_totals(hours, provider_name):
+            totals[event] = totals.get(event, 0) + count
+            channels = by_provider.setdefault(provider, {})
+            channels.setdefault(channel, {})[event] = count
 
         return {
-            "webhook_messages_24h": stats.get("webhook", 0),
-            "regular_messages_24h": stats.get("regular", 0),
-            "total_messages_24h": sum(stats.values()),
+            "webhook_messages_24h": totals["received"],
+            "duplicate_messages_24h": totals["duplicate"],
+            "sent_messages_24h": totals["sent"],
+            "failed_messages_24h": totals["failed"],
+            "total_messages_24h": totals["received"] + totals["sent"],
+            "by_provider": by_provider,
         }
 
     # Método alternativo usando templates nativos de Odoo
@@ -576,14 +1086,21 @@ class WebhookProcessor(models.Model):
         mimetype = attachment.mimetype or ""
         file_size = self._format_file_size(attachment.file_size or 0)
         file_url = f"/web/content/{attachment.id}"
+        # Miniatura generada en segundo plano; mientras no exista la ruta
+        # entrega la imagen original
+        preview_url = f"/hey_now/media/{attachment.id}/thumbnail"
         download_url = f"/web/content/{attachment.id}?download=true"
+        if attachment.chat_media_pending:
+            # Sin contenido aún: la ruta lo descarga en el primer acceso
+            file_url = f"/hey_now/media/{attachment.id}/content"
+            download_url = f"{file_url}?download=true"
 
         # Determinar el icono basado en el tipo de archivo
         file_icon = self._get_file_icon(mimetype, attachment.name)
 
         if mimetype.startswith("image/"):
             return self._render_image_attachment(
-                attachment, file_url, download_url, file_size
+                attachment, preview_url, download_url, file_size
             )
         elif mimetype == "application/pdf":
             return self._render_pdf_attachment(
@@ -591,7 +1108,7 @@ class WebhookProcessor(models.Model):
             )
         elif mimetype.startswith("video/"):
             return self._render_video_attachment(
-                attachment, file_url, download_url, file_size, file_icon
+                attachment, file_url, download_url, file_size, file_icon, preview_url
             )
         elif mimetype.startswith("audio/"):
             return self._render_audio_attachment(
@@ -654,13 +1171,13 @@ class WebhookProcessor(models.Model):
         """
 
     def _render_video_attachment(
-        self, attachment, file_url, download_url, file_size, file_icon
+        self, attachment, file_url, download_url, file_size, file_icon, poster_url=""
     ) -> str:
         """Renderiza attachment de video."""
         return f"""
         <div class="o_mail_attachment o_mail_attachment_video" data-id="{attachment.id}">
             <div class="o_mail_attachment_video_container">
-                <video controls style="max-width: 100%; max-height: 300px;">
+                <video controls preload="none" poster="{poster_url}" style="max-width: 100%; max-height: 300px;">
                     <source src="{file_url}" type="{attachment.mimetype}">
                     Tu navegador no soporta el elemento video.
                 </video>
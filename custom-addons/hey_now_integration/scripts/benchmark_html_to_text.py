@@ -0,0 +1,94 @@
+"""
+Compara html_to_text con la conversión anterior basada en BeautifulSoup:
+verifica que el texto sea idéntico y mide el tiempo por mensaje.
+
+Corpus: un archivo con un body JSON por línea, por ejemplo exportado con
+
+    psql -At -c "SELECT to_json(body) FROM mail_message
+                 WHERE model = 'mail.channel' AND body IS NOT NULL
+                 ORDER BY id DESC LIMIT 5000" odoo > bodies.jsonl
+
+    python scripts/benchmark_html_to_text.py bodies.jsonl
+
+Sin archivo se usa un corpus de ejemplo.
+"""
+import importlib.util
+import json
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+SAMPLE_BODIES = [
+    "<p>Hola, ¿en qué te puedo ayudar?</p>",
+    '<p>Buenos días <span class="o_mention">@Soporte</span>&nbsp;</p>'
+    '<p><img src="/web/static/emoji.png" alt=":)"> gracias</p>',
+    "<div><p>Línea 1<br>Línea 2</p><p><span></span></p></div>",
+    '<p>Tu pedido <b>#1234</b> &amp; factura <a href="/my/orders/1">aquí</a>'
+    "</p><!-- firma --><style>p{color:red}</style>",
+    "texto plano sin etiquetas",
+]
+
+
+def reference_html_to_text(body) -> str:
+    """Implementación anterior de Provider.clear_html_message"""
+    soup = BeautifulSoup(str(body), "html.parser")
+    for img in soup.find_all("img"):
+        img.decompose()
+    for tag in soup(["script", "style"]):
+        tag.decompose()
+    for span in soup.find_all("span"):
+        if not span.get_text(strip=True):
+            span.decompose()
+    text = soup.get_text(separator=" ", strip=True)
+    return " ".join(text.split())
+
+
+def load_html_to_text():
+    # Cargar el módulo por ruta para no importar el addon (requiere Odoo)
+    path = os.path.join(
+        os.path.dirname(__file__), "..", "models", "provider", "html_text.py"
+    )
+    spec = importlib.util.spec_from_file_location("html_text", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.html_to_text
+
+
+def load_corpus(path):
+    if not path:
+        return SAMPLE_BODIES * 200
+    with open(path, encoding="utf-8") as corpus:
+        return [json.loads(line) for line in corpus if line.strip()]
+
+
+def main():
+    html_to_text = load_html_to_text()
+    bodies = load_corpus(sys.argv[1] if len(sys.argv) > 1 else None)
+
+    mismatches = [
+        body for body in bodies if html_to_text(body) != reference_html_to_text(body)
+    ]
+
+    def run(func):
+        return min(
+            timeit.repeat(lambda: [func(body) for body in bodies], number=1, repeat=5)
+        )
+
+    reference = run(reference_html_to_text)
+    streaming = run(html_to_text)
+    print(f"mensajes:       {len(bodies)}")
+    print(f"diferencias:    {len(mismatches)}")
+    print(f"BeautifulSoup:  {reference / len(bodies) * 1e6:8.1f} µs/mensaje")
+    print(f"HTMLParser:     {streaming / len(bodies) * 1e6:8.1f} µs/mensaje")
+    print(f"speedup:        {reference / streaming:8.1f}x")
+    for body in mismatches[:10]:
+        print("---")
+        print(body)
+        print(reference_html_to_text(body))
+        print(html_to_text(body))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Servidor HTTP que reemplaza a HeyNow en pruebas de carga locales.
+
+- POST en cualquier ruta: endpoint de envío de mensajes (responde 200).
+- GET /files/<nombre>: fileshare, devuelve ``--file-size`` bytes.
+
+Configurar el chat.provider con base_url http://127.0.0.1:8099/ y lanzar
+scripts/loadtest_webhook.py con --fileshare-url http://127.0.0.1:8099/files
+
+    python scripts/fake_heynow_server.py --port 8099 --latency 50 --error-rate 0.01
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+STATS = {"posts": 0, "errors": 0, "files": 0, "bytes": 0}
+STATS_LOCK = threading.Lock()
+
+
+class FakeHeynowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    file_content = b""
+
+    def _count(self, key, value=1):
+        with STATS_LOCK:
+            STATS[key] += value
+
+    def _delay(self):
+        if self.options.latency:
+            time.sleep(self.options.latency / 1000.0)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self._delay()
+
+        if random.random() < self.options.error_rate:
+            self._count("errors")
+            self._reply(503, b'{"status": "unavailable"}', "application/json")
+            return
+
+        self._count("posts")
+        self._reply(200, b'{"status": "ok"}', "application/json")
+
+    def do_GET(self):
+        if not self.path.startswith("/files/"):
+            self._reply(404, b"not found", "text/plain")
+            return
+        self._delay()
+        content = self.file_content
+        if self.options.unique_files:
+            content = os.urandom(len(content))
+        self._count("files")
+        self._count("bytes", len(content))
+        self._reply(200, content, "image/jpeg")
+
+    def _reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def report(interval):
+    while True:
+        time.sleep(interval)
+        with STATS_LOCK:
+            print(json.dumps(STATS), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0, help="ms por respuesta")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--file-size", type=int, default=100 * 1024)
+    parser.add_argument(
+        "--unique-files", action="store_true", help="contenido distinto por descarga"
+    )
+    parser.add_argument("--report-interval", type=float, default=10)
+    options = parser.parse_args()
+
+    FakeHeynowHandler.options = options
+    FakeHeynowHandler.file_content = os.urandom(options.file_size)
+
+    reporter = threading.Thread(
+        target=report, args=(options.report_interval,), daemon=True
+    )
+    reporter.start()
+    server = ThreadingHTTPServer((options.host, options.port), FakeHeynowHandler)
+    print(f"Fake HeyNow listening on http://{options.host}:{options.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(STATS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Generador de carga para /webhook/chat/<provider>.
+
+Reenvía un payload de HeyNow (por defecto evet.json["new"]) a una tasa fija
+con un idMessageHey nuevo en cada envío, repartido entre ``--clients``
+contactos y con los archivos apuntando al fileshare falso
+(scripts/fake_heynow_server.py). Informa:
+
+- latencia del acuse (2xx) del controlador: p50/p95/p99 y códigos HTTP;
+- crecimiento del backlog de queue_job y de la bandeja de entrada (con --dsn);
+- mensajes procesados por segundo de extremo a extremo (con --dsn).
+
+    python scripts/fake_heynow_server.py &
+    python scripts/loadtest_webhook.py --url http://localhost:8069 \\
+        --rate 50 --duration 60 --clients 200 \\
+        --fileshare-url http://127.0.0.1:8099/files \\
+        --dsn "dbname=odoo user=odoo host=localhost"
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+DEFAULT_PAYLOAD = os.path.join(os.path.dirname(__file__), "..", "evet.json")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def load_template(path, key):
+    with open(path, encoding="utf-8") as payload_file:
+        payload = json.load(payload_file)
+    return payload.get(key, payload) if key else payload
+
+
+def build_payload(template, sequence, options):
+    """Copia del payload con ID de mensaje, contacto y archivos únicos"""
+    payload = copy.deepcopy(template)
+    data = payload.setdefault("data", {})
+    client_id = f"load{sequence % options.clients:08d}"
+
+    for key in (payload.get("event", {}).get("key", {}), data, data.get("_id", {})):
+        if "clientId" in key:
+            key["clientId"] = client_id
+    trace = data.setdefault("lastMessageTrace", {})
+    trace["idMessageHey"] = str(uuid.uuid4())
+    data["message"] = f"Mensaje de carga {sequence}"
+
+    temporal = data.get("metaData", {}).get("temporal") or []
+    if options.no_files:
+        temporal.clear()
+    for file in temporal:
+        file["temporalId"] = uuid.uuid4().hex
+        if options.fileshare_url:
+            file["urlFileshare"] = f"{options.fileshare_url}/{file['temporalId']}.jpg"
+    return payload
+
+
+class BacklogSampler(threading.Thread):
+    """
+    Muestrea los webhooks pendientes (queue_job y bandeja de entrada) y los
+    mensajes de webhook creados desde el inicio
+    """
+
+    def __init__(self, dsn, interval):
+        super().__init__(daemon=True)
+        import psycopg2
+
+        self.connection = psycopg2.connect(dsn)
+        self.connection.autocommit = True
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        with self.connection.cursor() as cr:
+            cr.execute("SELECT now()")
+            self.started_at = cr.fetchone()[0]
+
+    def sample(self):
+        with self.connection.cursor() as cr:
+            cr.execute(
+                """
+                SELECT
+                    (SELECT COUNT(*) FROM queue_job
+                     WHERE state IN ('pending', 'enqueued', 'started'))
+                    + (SELECT COUNT(*) FROM chat_webhook_inbox
+                       WHERE state = 'pending'),
+                    (SELECT COUNT(*) FROM mail_message
+                     WHERE is_from_webhook AND create_date >= %s)
+            """,
+                (self.started_at,),
+            )
+            backlog, processed = cr.fetchone()
+        sample = (time.time(), backlog, processed)
+        self.samples.append(sample)
+        return sample
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            _at, backlog, processed = self.sample()
+            print(f"  backlog={backlog} processed={processed}", flush=True)
+
+
+def is_accepted(status, body):
+    """
+    Acuse de recibo: cualquier 2xx cuyo cuerpo no informe un error. El
+    ``status`` del cuerpo puede venir en la raíz o en ``result`` (JSON-RPC).
+    """
+    if not isinstance(status, int) or not 200 <= status < 300:
+        return False
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return True
+    if isinstance(data, dict) and isinstance(data.get("result"), dict):
+        data = data["result"]
+    return not (isinstance(data, dict) and data.get("status") == "error")
+
+
+def send(url, body, timeout):
+    request = urllib.request.Request(
+        url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    start = time.perf_counter()
+    response_body = b""
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response_body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = "error"
+    latency = time.perf_counter() - start
+    return status, latency, is_accepted(status, response_body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8069")
+    parser.add_argument("--provider", default="heynow")
+    parser.add_argument("--payload", default=DEFAULT_PAYLOAD)
+    parser.add_argument("--payload-key", default="new")
+    parser.add_argument("--rate", type=float, default=10, help="webhooks/s")
+    parser.add_argument("--duration", type=float, default=30, help="segundos")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--fileshare-url", default="")
+    parser.add_argument("--no-files", action="store_true")
+    parser.add_argument("--dsn", default="", help="DSN de PostgreSQL (opcional)")
+    parser.add_argument("--drain", type=float, default=120, help="espera máx. (s)")
+    parser.add_argument("--sample-interval", type=float, default=5)
+    options = parser.parse_args()
+
+    template = load_template(options.payload, options.payload_key)
+    url = f"{options.url.rstrip('/')}/webhook/chat/{options.provider}"
+    sampler = None
+    if options.dsn:
+        sampler = BacklogSampler(options.dsn, options.sample_interval)
+        sampler.sample()
+        sampler.start()
+
+    results = []
+    total = int(options.rate * options.duration)
+    print(f"Sending {total} webhooks to {url} at {options.rate}/s", flush=True)
+
+    # Carga en lazo abierto: cada envío sale a su hora aunque el servidor
+    # responda lento, así la latencia del acuse no frena la tasa
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as executor:
+        futures = []
+        for sequence in range(total):
+            delay = start + sequence / options.rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            body = json.dumps(build_payload(template, sequence, options)).encode()
+            futures.append(executor.submit(send, url, body, options.timeout))
+        results = [future.result() for future in futures]
+    elapsed = time.time() - start
+
+    latencies = [latency for _status, latency, _accepted in results]
+    accepted = sum(1 for _status, _latency, ok in results if ok)
+    statuses = {}
+    for status, _latency, _accepted in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    print(f"\nSent {len(results)} webhooks in {elapsed:.1f}s")
+    print(f"Ack rate:    {len(results) / elapsed:.1f}/s")
+    print(f"Status:      {statuses}")
+    print(f"Accepted:    {accepted}")
+    for fraction in (0.5, 0.95, 0.99):
+        label = f"p{int(fraction * 100)}"
+        print(f"Ack {label}:     {percentile(latencies, fraction) * 1000:.1f} ms")
+
+    if not sampler:
+        return
+
+    # Esperar a que la cola se vacíe para medir el rendimiento de punta a punta
+    deadline = time.time() + options.drain
+    while time.time() < deadline:
+        _at, backlog, _processed = sampler.sample()
+        if not backlog:
+            break
+        time.sleep(options.sample_interval)
+    sampler.stopped.set()
+
+    first_at, first_backlog, _processed = sampler.samples[0]
+    last_at, last_backlog, processed = sampler.samples[-1]
+    peak = max(backlog for _at, backlog, _processed in sampler.samples)
+    print(f"Backlog:     start={first_backlog} peak={peak} end={last_backlog}")
+    print(f"Backlog growth during load: {(peak - first_backlog) / elapsed:.1f} jobs/s")
+    print(
+        f"Processed:   {processed}/{accepted} in {last_at - first_at:.1f}s"
+        f" ({processed / max(last_at - first_at, 0.001):.1f} msg/s end-to-end)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from . import test_webhook_admission
+from . import test_webhook_processor
+from . import test_res_partner
+from . import test_webhook_inbox
+from . import test_metrics
+from . import test_mail_channel
+from . import test_rate_bucket
+from . import test_send_to_provider
+from . import test_webhook_batch
+from . import test_message_latency
+from . import test_offload_inline_media
+from . import test_chat_media_fetch
+from . import test_media_previews
+from . import test_http_pool
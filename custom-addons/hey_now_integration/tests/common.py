@@ -0,0 +1,48 @@
+from ..models.admission import BacklogGauge
+
+# Canal WhatsApp de Heynow (HeynowChannelType.WHATSAPP)
+HEYNOW_WHATSAPP = 1
+
+
+def make_heynow_payload(
+    client_id="client-1", message_id="hey-1", text="Hola", incoming=True
+):
+    """Webhook mínimo de Heynow con un mensaje de texto"""
+    return {
+        "event": {
+            "key": {
+                "clientId": client_id,
+                "channel": HEYNOW_WHATSAPP,
+                "session": f"session-{client_id}",
+            },
+            "new": {"__contact": {"first_name": "Cliente", "last_name": client_id}},
+        },
+        "data": {
+            "message": text,
+            "incoming": incoming,
+            "lastMessageTrace": {"idMessageHey": message_id},
+        },
+    }
+
+
+def create_heynow_provider(env):
+    """Proveedor Heynow activo con el canal WhatsApp permitido"""
+    env["chat.provider"].search([("provider_type", "=", "heynow")]).write(
+        {"is_active": False}
+    )
+    return env["chat.provider"].create(
+        {
+            "name": "Heynow test",
+            "provider_type": "heynow",
+            "base_url": "https://heynow.example.com",
+            "auth_token": "test-token",
+            "allowed_channel_ids": [
+                (6, 0, [env.ref("hey_now_integration.channel_whatsapp").id])
+            ],
+        }
+    )
+
+
+def reset_backlog_gauge():
+    """El gauge de la cola es por proceso: vaciarlo entre tests"""
+    BacklogGauge._values.clear()
@@ -0,0 +1,27 @@
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.queue_job.tests.common import trap_jobs
+
+
+@tagged("post_install", "-at_install")
+class TestChatMediaFetch(TransactionCase):
+    def test_one_fetch_job_per_pending_attachment(self):
+        """Una URL caída no deja pendientes a los demás adjuntos del mensaje"""
+        attachments = self.env["ir.attachment"].create(
+            [
+                {
+                    "name": f"foto-{index}.jpg",
+                    "type": "url",
+                    "url": f"https://files.example.com/{index}.jpg",
+                    "chat_media_pending": True,
+                }
+                for index in range(2)
+            ]
+        )
+        with trap_jobs() as trap:
+            attachments._enqueue_chat_media_fetch()
+        trap.assert_jobs_count(2, only=attachments._fetch_chat_media)
+        self.assertEqual(
+            sorted(job.recordset.ids for job in trap.enqueued_jobs),
+            sorted([attachment.ids for attachment in attachments]),
+        )
@@ -0,0 +1,23 @@
+from odoo.tests import TransactionCase, tagged
+
+from ..models.provider.http_pool import HttpPoolConfig
+
+
+@tagged("post_install", "-at_install")
+class TestHttpPoolConfig(TransactionCase):
+    def test_boolean_strings(self):
+        for value, expected in (("false", False), ("0", False), ("yes", True)):
+            config = HttpPoolConfig.from_dict({"keep_alive": value})
+            self.assertIs(config.keep_alive, expected, value)
+        self.assertIs(HttpPoolConfig.from_dict({"keep_alive": 0}).keep_alive, False)
+
+    def test_invalid_values_fall_back_to_defaults(self):
+        with self.assertLogs(
+            "odoo.addons.hey_now_integration.models.provider.http_pool", "WARNING"
+        ):
+            config = HttpPoolConfig.from_dict(
+                {"pool_maxsize": "abc", "keep_alive": "maybe", "read_timeout": "3"}
+            )
+        self.assertEqual(config.pool_maxsize, HttpPoolConfig.pool_maxsize)
+        self.assertIs(config.keep_alive, True)
+        self.assertEqual(config.read_timeout, 3.0)
@@ -0,0 +1,37 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestFindOrCreateChannel(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.Channel = cls.env["mail.channel"]
+        cls.customer = cls.env["res.partner"].create({"name": "Cliente"})
+        cls.agent = cls.env["res.partner"].create({"name": "Agente"})
+
+    def setUp(self):
+        super().setUp()
+        self.env.registry.clear_caches()
+
+    def _find_or_create(self, provider_name, partners):
+        return self.Channel.find_or_create_channel(
+            provider_name=provider_name,
+            channel_name="Cliente",
+            external_channel_id="ext-1",
+            partner_ids=partners.ids,
+        )
+
+    def test_channel_is_scoped_by_provider(self):
+        heynow = self._find_or_create("heynow", self.customer)
+        self.assertEqual(self._find_or_create("heynow", self.customer), heynow)
+        botpress = self._find_or_create("botpress", self.customer)
+        self.assertNotEqual(botpress, heynow)
+        self.assertEqual(botpress.provider_name, "botpress")
+
+    def test_members_are_synced_on_cache_hit(self):
+        channel = self._find_or_create("heynow", self.customer)
+        # La segunda llamada sale de la caché y agrega al nuevo partner
+        self._find_or_create("heynow", self.customer | self.agent)
+        self.assertIn(self.agent, channel.channel_member_ids.partner_id)
@@ -0,0 +1,33 @@
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models.media import previews
+
+
+@tagged("post_install", "-at_install")
+class TestMediaPreviews(TransactionCase):
+    def _image_path(self, width, height):
+        fd, path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        Image.new("RGB", (width, height), "red").save(path, format="PNG")
+        return path
+
+    def test_thumbnail_is_generated(self):
+        raw, mimetype = previews.make_image_thumbnail(self._image_path(40, 20), 10)
+        self.assertEqual(mimetype, "image/jpeg")
+        with Image.open(io.BytesIO(raw)) as thumbnail:
+            self.assertEqual(thumbnail.size, (10, 5))
+
+    def test_oversized_image_is_rejected_before_decoding(self):
+        """Imágenes de webhooks: sin límite de píxeles un PNG agota la memoria"""
+        path = self._image_path(40, 20)
+        with patch.object(previews, "IMAGE_MAX_RESOLUTION", 799):
+            with self.assertRaises(ValueError):
+                previews.make_image_thumbnail(path, 10)
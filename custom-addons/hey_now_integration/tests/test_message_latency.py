@@ -0,0 +1,26 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestMessageLatency(TransactionCase):
+    def test_downloads_count_as_attachment_ingest(self):
+        """La descarga previa no se suma a la resolución de partner y canal"""
+        latency = self.env["chat.message.latency"]
+        latency.record(
+            "latency-test",
+            {
+                "received": 100.0,
+                "enqueued": 100.5,
+                "job_start": 101.0,
+                "download_start": 101.0,
+                "downloaded": 104.0,
+                "resolved": 104.25,
+                "attachments": 105.0,
+                "posted": 105.5,
+            },
+        )
+        row = latency.search([("provider_name", "=", "latency-test")])
+        self.assertAlmostEqual(row.resolve, 0.25)
+        self.assertAlmostEqual(row.attachments, 3.75)
+        self.assertAlmostEqual(row.post, 0.5)
+        self.assertAlmostEqual(row.total, 5.5)
@@ -0,0 +1,39 @@
+from odoo.tests import HttpCase, tagged
+
+METRICS_URL = "/hey_now/metrics"
+
+
+@tagged("post_install", "-at_install")
+class TestMetricsAccess(HttpCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.params = cls.env["ir.config_parameter"].sudo()
+        cls.params.set_param("hey_now_integration.metrics_token", False)
+        cls.params.set_param("hey_now_integration.metrics_allowed_ips", False)
+
+    def test_hidden_without_configuration_even_from_loopback(self):
+        self.assertEqual(self.url_open(METRICS_URL).status_code, 404)
+
+    def test_token_in_header_or_query(self):
+        self.params.set_param("hey_now_integration.metrics_token", "s3cret")
+        response = self.url_open(
+            METRICS_URL, headers={"Authorization": "Bearer s3cret"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hey_now_webhook_backlog", response.text)
+        self.assertEqual(self.url_open(f"{METRICS_URL}?token=s3cret").status_code, 200)
+        self.assertEqual(
+            self.url_open(
+                METRICS_URL, headers={"Authorization": "Bearer wrong"}
+            ).status_code,
+            404,
+        )
+
+    def test_allowed_networks(self):
+        self.params.set_param(
+            "hey_now_integration.metrics_allowed_ips", "10.0.0.0/8, 127.0.0.1"
+        )
+        self.assertEqual(self.url_open(METRICS_URL).status_code, 200)
+        self.params.set_param("hey_now_integration.metrics_allowed_ips", "10.0.0.0/8")
+        self.assertEqual(self.url_open(METRICS_URL).status_code, 404)
@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock, patch
+
+from odoo.tests import TransactionCase, tagged
+
+from .common import make_heynow_payload
+
+INLINE_PNG = "data:image/png;base64," + "iVBORw0KGgo" * 10
+
+
+@tagged("post_install", "-at_install")
+class TestOffloadInlineMedia(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env["ir.config_parameter"].sudo().set_param(
+            "hey_now_integration.media_offload_threshold", 20
+        )
+        cls.processor = cls.env["webhook.processor"]
+
+    def test_only_media_entries_are_offloaded(self):
+        payload = make_heynow_payload()
+        payload["data"]["metaData"] = {
+            "temporal": [
+                {"name": "foto.png", "data": INLINE_PNG},
+                {"name": "roto.png", "data": "data:image/png;base64" + "A" * 40},
+            ]
+        }
+        # Un "data" largo fuera de la lista de archivos no se toca
+        payload["event"]["new"]["data"] = "x" * 100
+
+        writer = MagicMock(checksum="abc123", size=70)
+        with patch.object(
+            type(self.env["ir.attachment"]), "_stage_chat_media", return_value=writer
+        ) as stage:
+            self.processor._offload_inline_media("heynow", payload)
+
+        stage.assert_called_once()
+        good, broken = payload["data"]["metaData"]["temporal"]
+        self.assertEqual(good["dataRef"], {"checksum": "abc123", "size": 70})
+        self.assertNotIn("data", good)
+        # Un data: sin coma no corta el recorrido: queda marcado con el error
+        self.assertIn("dataError", broken)
+        self.assertNotIn("data", broken)
+        self.assertEqual(payload["event"]["new"]["data"], "x" * 100)
@@ -0,0 +1,33 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestProviderRateBucket(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        # try_acquire abre su propio cursor: en modo test comparte el de la prueba
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        self.Bucket = self.env["chat.provider.rate.bucket"]
+
+    def test_burst_then_wait(self):
+        self.assertEqual(self.Bucket.try_acquire("test:1", 1.0, 2.0), 0.0)
+        self.assertEqual(self.Bucket.try_acquire("test:1", 1.0, 2.0), 0.0)
+        wait = self.Bucket.try_acquire("test:1", 1.0, 2.0)
+        self.assertGreater(wait, 0.0)
+        self.assertLessEqual(wait, 1.0)
+        # Otra cuenta tiene su propio bucket
+        self.assertEqual(self.Bucket.try_acquire("test:2", 1.0, 2.0), 0.0)
+
+    def test_tokens_refill_over_time(self):
+        for _index in range(2):
+            self.Bucket.try_acquire("test:refill", 1.0, 2.0)
+        self.env.cr.execute(
+            "UPDATE chat_provider_rate_bucket SET updated_at = updated_at - 10"
+            " WHERE key = 'test:refill'"
+        )
+        self.assertEqual(self.Bucket.try_acquire("test:refill", 1.0, 2.0), 0.0)
+
+    def test_disabled_limit_does_not_touch_the_table(self):
+        self.assertEqual(self.Bucket.try_acquire("test:off", 0.0, 0.0), 0.0)
+        self.assertFalse(self.Bucket.search([("key", "=", "test:off")]))
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from odoo.exceptions import MissingError
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import mute_logger
+
+from odoo.addons.queue_job.exception import RetryableJobError
+
+
+@tagged("post_install", "-at_install")
+class TestFindOrCreatePartner(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Partner = cls.env["res.partner"]
+
+    def setUp(self):
+        super().setUp()
+        self.env.registry.clear_caches()
+
+    def _provider_data(self, user_id):
+        return {"user_id": user_id, "provider_name": "heynow", "user_name": "Ana"}
+
+    def test_partner_is_created_once(self):
+        partner = self.Partner.find_or_create_partner(self._provider_data("u-1"))
+        self.assertTrue(partner.is_provider_chat_user)
+        again = self.Partner.find_or_create_partner(self._provider_data("u-1"))
+        self.assertEqual(again, partner)
+        self.assertEqual(
+            self.Partner.search_count([("provider_user_id", "=", "u-1")]), 1
+        )
+
+    def test_cached_lookup_does_not_write(self):
+        partner = self.Partner.create({"name": "Ana", "provider_user_id": "u-2"})
+        self.assertEqual(
+            self.Partner._get_provider_partner_id("u-2"), (partner.id, False)
+        )
+        self.assertFalse(partner.is_provider_chat_user)
+
+        self.assertEqual(
+            self.Partner.find_or_create_partner(self._provider_data("u-2")), partner
+        )
+        self.assertTrue(partner.is_provider_chat_user)
+        # write() limpió la caché: la siguiente búsqueda ya ve el flag
+        self.assertEqual(
+            self.Partner._get_provider_partner_id("u-2"), (partner.id, True)
+        )
+
+    @mute_logger("odoo.sql_db")
+    def test_concurrent_create_is_retried(self):
+        """Otro job creó el partner y esta transacción no lo ve"""
+        self.Partner.create({"name": "Ana", "provider_user_id": "u-3"})
+        with patch.object(
+            type(self.Partner),
+            "_get_provider_partner_id",
+            side_effect=MissingError("not visible"),
+        ):
+            with self.assertRaises(RetryableJobError):
+                self.Partner.find_or_create_partner(self._provider_data("u-3"))
+        self.assertEqual(
+            self.Partner.search_count([("provider_user_id", "=", "u-3")]), 1
+        )
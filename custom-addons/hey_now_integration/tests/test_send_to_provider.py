@@ -0,0 +1,168 @@
+import base64
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.queue_job.exception import RetryableJobError
+
+from ..models.provider.heynow import HeynowProvider
+from .common import create_heynow_provider
+
+
+def _response(status_code=200):
+    return MagicMock(status_code=status_code, text="ok", headers={})
+
+
+@tagged("post_install", "-at_install")
+class TestSendToProviderParts(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        create_heynow_provider(cls.env)
+        cls.channel = cls.env["mail.channel"].create(
+            {
+                "name": "Cliente",
+                "channel_type": "chat",
+                "provider_name": "heynow",
+                "external_channel_id": "client-parts",
+                "provider_metadata": {"clientId": "client-parts", "channel": 1},
+            }
+        )
+        attachments = cls.env["ir.attachment"].create(
+            [
+                {
+                    "name": f"foto-{index}.png",
+                    "datas": base64.b64encode(b"png"),
+                    "mimetype": "image/png",
+                }
+                for index in range(3)
+            ]
+        )
+        cls.message = cls.env["mail.message"].create(
+            {
+                "model": "mail.channel",
+                "res_id": cls.channel.id,
+                "body": "<p>Fotos</p>",
+                "message_type": "comment",
+                "message_id_provider_chat": "out-parts",
+                "attachment_ids": [(6, 0, attachments.ids)],
+            }
+        )
+
+    def setUp(self):
+        super().setUp()
+        # Las partes se registran en otra transacción: en modo test, la misma
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+
+    def _sent_ids(self, post):
+        return [call.kwargs["json"]["idMessageHey"] for call in post.call_args_list]
+
+    def test_retry_skips_parts_already_accepted(self):
+        with patch.object(
+            HeynowProvider,
+            "post",
+            side_effect=[_response(), _response(), requests.ConnectionError()],
+        ) as post:
+            with self.assertRaises(RetryableJobError):
+                self.channel._send_to_provider(self.message, "heynow")
+        self.assertEqual(
+            self._sent_ids(post), ["out-parts", "out-parts-1", "out-parts-2"]
+        )
+
+        with patch.object(HeynowProvider, "post", return_value=_response()) as post:
+            self.channel._send_to_provider(self.message, "heynow")
+        self.assertEqual(self._sent_ids(post), ["out-parts-2"])
+        self.assertEqual(self.message.provider_delivery_state, "sent")
+        self.assertFalse(
+            self.env["chat.message.sent.part"]._get_sent_keys(self.message.id)
+        )
+
+    def test_single_payload_is_not_recorded(self):
+        message = self.message.copy(
+            {
+                "attachment_ids": [],
+                "body": "<p>Hola</p>",
+                "message_id_provider_chat": "out-single",
+            }
+        )
+        with patch.object(
+            type(self.env["chat.message.sent.part"]), "_record"
+        ) as record, patch.object(HeynowProvider, "post", return_value=_response()):
+            self.channel._send_to_provider(message, "heynow")
+        record.assert_not_called()
+        self.assertEqual(message.provider_delivery_state, "sent")
+
+    def test_conversation_order_is_kept(self):
+        """Un envío espera mientras haya un mensaje anterior pendiente"""
+        older, newer = self.env["mail.message"].create(
+            [
+                {
+                    "model": "mail.channel",
+                    "res_id": self.channel.id,
+                    "body": f"<p>{text}</p>",
+                    "message_type": "comment",
+                    "message_id_provider_chat": f"out-order-{text}",
+                    "provider_delivery_state": "pending",
+                }
+                for text in ("uno", "dos")
+            ]
+        )
+        with patch.object(HeynowProvider, "post", return_value=_response()) as post:
+            with self.assertRaises(RetryableJobError):
+                self.channel._send_to_provider(newer, "heynow")
+            post.assert_not_called()
+
+            self.channel._send_to_provider(older, "heynow")
+            self.channel._send_to_provider(newer, "heynow")
+        self.assertEqual(self._sent_ids(post), ["out-order-uno", "out-order-dos"])
+        self.assertEqual(newer.provider_delivery_state, "sent")
+
+    def test_coalescing_stops_at_a_locked_message(self):
+        """Si otro job tiene bloqueado B, C no sale antes que B junto con A"""
+        first, locked, last = self.env["mail.message"].create(
+            [
+                {
+                    "model": "mail.channel",
+                    "res_id": self.channel.id,
+                    "body": f"<p>{text}</p>",
+                    "message_type": "comment",
+                    "provider_delivery_state": "pending",
+                }
+                for text in ("a", "b", "c")
+            ]
+        )
+        Channel = type(self.channel)
+        lock = Channel._lock_pending_message
+        with patch.object(
+            Channel,
+            "_lock_pending_message",
+            autospec=True,
+            side_effect=lambda channel, message_id: message_id != locked.id
+            and lock(channel, message_id),
+        ):
+            messages = self.channel._get_coalescable_messages(first, 60)
+        self.assertEqual(messages, first)
+
+        messages = self.channel._get_coalescable_messages(first, 60)
+        self.assertEqual(messages, first | locked | last)
+
+    def test_each_part_takes_a_rate_limit_token(self):
+        with patch.object(
+            HeynowProvider, "acquire_send_slot", side_effect=[0.0, 0.0, 5.0]
+        ), patch.object(HeynowProvider, "post", return_value=_response()) as post:
+            with self.assertRaises(RetryableJobError):
+                self.channel._send_to_provider(self.message, "heynow")
+        self.assertEqual(self._sent_ids(post), ["out-parts", "out-parts-1"])
+
+        with patch.object(
+            HeynowProvider, "acquire_send_slot", return_value=0.0
+        ) as acquire, patch.object(
+            HeynowProvider, "post", return_value=_response()
+        ) as post:
+            self.channel._send_to_provider(self.message, "heynow")
+        self.assertEqual(self._sent_ids(post), ["out-parts-2"])
+        self.assertEqual(acquire.call_count, 1)
@@ -0,0 +1,75 @@
+import json
+
+from odoo.tests import HttpCase, tagged
+
+from .common import create_heynow_provider, make_heynow_payload, reset_backlog_gauge
+
+
+@tagged("post_install", "-at_install")
+class TestWebhookAdmission(HttpCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.provider = create_heynow_provider(cls.env)
+        cls.params = cls.env["ir.config_parameter"].sudo()
+        cls.params.set_param("hey_now_integration.webhook_backlog_retry_after", 17)
+
+    def setUp(self):
+        super().setUp()
+        reset_backlog_gauge()
+        self.addCleanup(reset_backlog_gauge)
+
+    def _post(self, data, path="/webhook/chat/heynow"):
+        return self.url_open(
+            path,
+            data=json.dumps(data),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def _fill_backlog(self, count):
+        inbox = self.env["chat.webhook.inbox"]
+        for index in range(count):
+            inbox.enqueue("heynow", {}, f"backlog-{index}")
+
+    def _set_limits(self, soft, hard):
+        self.params.set_param("hey_now_integration.webhook_backlog_soft_limit", soft)
+        self.params.set_param("hey_now_integration.webhook_backlog_hard_limit", hard)
+
+    def test_soft_limit_answers_429_with_retry_after(self):
+        self._set_limits(2, 0)
+        self._fill_backlog(2)
+        response = self._post(make_heynow_payload())
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers.get("Retry-After"), "17")
+        self.assertEqual(response.json()["retry_after"], 17)
+
+    def test_hard_limit_answers_503_with_retry_after(self):
+        self._set_limits(1, 2)
+        self._fill_backlog(2)
+        response = self._post(make_heynow_payload())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers.get("Retry-After"), "17")
+
+    def test_batch_route_is_throttled_too(self):
+        self._set_limits(1, 0)
+        self._fill_backlog(1)
+        response = self._post([make_heynow_payload()], "/webhook/chat/heynow/batch")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers.get("Retry-After"), "17")
+
+    def test_below_limits_is_accepted_with_202(self):
+        self._set_limits(10, 20)
+        self._fill_backlog(1)
+        response = self._post(make_heynow_payload(message_id="hey-accepted"))
+        self.assertEqual(response.status_code, 202)
+        self.assertNotIn("Retry-After", response.headers)
+        self.assertEqual(response.json()["status"], "enqueued")
+
+    def test_invalid_json_keeps_http_status(self):
+        self._set_limits(0, 0)
+        response = self.url_open(
+            "/webhook/chat/heynow",
+            data="{not json",
+            headers={"Content-Type": "application/json"},
+        )
+        self.assertEqual(response.status_code, 400)
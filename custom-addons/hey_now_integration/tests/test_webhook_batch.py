@@ -0,0 +1,77 @@
+import json
+
+from odoo.tests import HttpCase, tagged
+
+from .common import create_heynow_provider, make_heynow_payload, reset_backlog_gauge
+
+BATCH_URL = "/webhook/chat/heynow/batch"
+# Canal Instagram de Heynow, no permitido en el proveedor de prueba
+HEYNOW_INSTAGRAM = 7
+
+
+@tagged("post_install", "-at_install")
+class TestWebhookBatch(HttpCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.provider = create_heynow_provider(cls.env)
+        cls.params = cls.env["ir.config_parameter"].sudo()
+        cls.params.set_param("hey_now_integration.webhook_backlog_soft_limit", 0)
+        cls.params.set_param("hey_now_integration.webhook_backlog_hard_limit", 0)
+
+    def setUp(self):
+        super().setUp()
+        reset_backlog_gauge()
+        self.addCleanup(reset_backlog_gauge)
+
+    def _post(self, data):
+        return self.url_open(
+            BATCH_URL,
+            data=json.dumps(data),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def _invalid_channel_payload(self):
+        payload = make_heynow_payload(message_id="hey-batch-instagram")
+        payload["event"]["key"]["channel"] = HEYNOW_INSTAGRAM
+        return payload
+
+    def test_each_event_gets_its_own_result(self):
+        response = self._post(
+            {
+                "events": [
+                    make_heynow_payload(message_id="hey-batch-ok"),
+                    self._invalid_channel_payload(),
+                    "not an event",
+                ]
+            }
+        )
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual((body["enqueued"], body["rejected"]), (1, 2))
+        ok, invalid_channel, malformed = body["results"]
+        self.assertEqual(ok["status"], "enqueued")
+        self.assertTrue(self.env["queue.job"].search([("uuid", "=", ok["job_id"])]))
+        self.assertEqual(invalid_channel["message"], "Invalid channel")
+        self.assertEqual(malformed["status"], "error")
+
+    def test_inbox_mode_reports_duplicates(self):
+        self.params.set_param("hey_now_integration.webhook_ingest_mode", "inbox")
+        payload = make_heynow_payload(message_id="hey-batch-inbox")
+        response = self._post([payload, payload])
+        self.assertEqual(response.status_code, 202)
+        statuses = [result["status"] for result in response.json()["results"]]
+        self.assertEqual(statuses, ["enqueued", "duplicate"])
+
+    def test_only_rejected_events_answer_400(self):
+        response = self._post([self._invalid_channel_payload()])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["enqueued"], 0)
+
+    def test_batch_over_the_limit_answers_413(self):
+        self.params.set_param("hey_now_integration.webhook_batch_max_events", 2)
+        response = self._post([make_heynow_payload()] * 3)
+        self.assertEqual(response.status_code, 413)
+
+    def test_empty_batch_answers_400(self):
+        self.assertEqual(self._post({"events": []}).status_code, 400)
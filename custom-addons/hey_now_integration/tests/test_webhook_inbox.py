@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from odoo.exceptions import MissingError
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.queue_job.exception import RetryableJobError
+from odoo.addons.queue_job.tests.common import trap_jobs
+
+from .common import make_heynow_payload
+
+
+@tagged("post_install", "-at_install")
+class TestWebhookInbox(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Inbox = cls.env["chat.webhook.inbox"]
+        cls.Processor = type(cls.env["webhook.processor"])
+        # Sin disparos del cron consumidor durante las pruebas
+        patcher = patch.object(type(cls.Inbox), "_trigger_consumer")
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+
+    def _enqueue(self, message_key):
+        return self.Inbox.enqueue(
+            "heynow", make_heynow_payload(message_id=message_key), message_key
+        )
+
+    def _claim(self, inbox_id):
+        return [row for row in self.Inbox._claim_batch(100) if row[0] == inbox_id]
+
+    def test_enqueue_is_idempotent(self):
+        self.assertTrue(self._enqueue("inbox-1"))
+        self.assertIsNone(self._enqueue("inbox-1"))
+
+    def test_processed_row_is_marked_done(self):
+        inbox = self.Inbox.browse(self._enqueue("inbox-done"))
+        with patch.object(self.Processor, "process_webhook_event") as process:
+            self.Inbox._process_batch(self._claim(inbox.id))
+        process.assert_called_once()
+        self.assertEqual(inbox.state, "done")
+        self.assertFalse(inbox.payload)
+
+    def test_failed_row_does_not_cache_rolled_back_ids(self):
+        """Un partner creado en el savepoint deshecho no queda en ormcache"""
+        Partner = self.env["res.partner"]
+        provider_data = {"user_id": "inbox-user", "provider_name": "heynow"}
+
+        def fail_after_create(*args, **kwargs):
+            Partner.find_or_create_partner(provider_data)
+            Partner._get_provider_partner_id("inbox-user")
+            raise ValueError("boom")
+
+        inbox = self.Inbox.browse(self._enqueue("inbox-failed"))
+        with patch.object(
+            self.Processor, "process_webhook_event", side_effect=fail_after_create
+        ):
+            self.Inbox._process_batch(self._claim(inbox.id))
+
+        inbox.invalidate_recordset()
+        self.assertEqual(inbox.state, "pending")
+        self.assertEqual(inbox.attempts, 1)
+        with self.assertRaises(MissingError):
+            Partner._get_provider_partner_id("inbox-user")
+
+    def test_retryable_conflict_keeps_attempts(self):
+        inbox = self.Inbox.browse(self._enqueue("inbox-retry"))
+        error = RetryableJobError("race", seconds=1, ignore_retry=True)
+        with patch.object(self.Processor, "process_webhook_event", side_effect=error):
+            self.Inbox._process_batch(self._claim(inbox.id))
+        inbox.invalidate_recordset()
+        self.assertEqual(inbox.state, "pending")
+        self.assertEqual(inbox.attempts, 0)
+
+    def test_extra_consumers_are_dispatched_for_large_backlogs(self):
+        for index in range(5):
+            self._enqueue(f"inbox-backlog-{index}")
+        with trap_jobs() as trap:
+            self.Inbox._dispatch_consumers(3, batch_size=2)
+        # 5 pendientes en lotes de 2: el cron y dos consumidores más
+        trap.assert_jobs_count(2, only=self.Inbox._process_inbox)
+
+        with trap_jobs() as trap:
+            self.Inbox._dispatch_consumers(3, batch_size=100)
+        trap.assert_jobs_count(0)
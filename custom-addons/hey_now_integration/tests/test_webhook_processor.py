@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import mute_logger
+
+from odoo.addons.queue_job.exception import RetryableJobError
+
+from ..models.payloads.heynow import HeynowChannelType
+from .common import HEYNOW_WHATSAPP, create_heynow_provider, make_heynow_payload
+
+
+@tagged("post_install", "-at_install")
+class TestWebhookProcessorDuplicates(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.provider = create_heynow_provider(cls.env)
+        cls.processor = cls.env["webhook.processor"]
+
+    def _webhook_messages(self, message_id):
+        return self.env["mail.message"].search(
+            [
+                ("message_id_provider_chat", "=", message_id),
+                ("is_from_webhook", "=", True),
+            ]
+        )
+
+    def test_new_message_is_created_once(self):
+        payload = make_heynow_payload(message_id="hey-new")
+        result = self.processor.process_webhook_event("heynow", payload)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(len(self._webhook_messages("hey-new")), 1)
+
+    def test_repeated_message_is_reported_as_duplicate(self):
+        payload = make_heynow_payload(message_id="hey-repeat")
+        self.processor.process_webhook_event("heynow", payload)
+        result = self.processor.process_webhook_event("heynow", payload)
+        self.assertEqual(result["status"], "duplicate")
+        self.assertEqual(len(self._webhook_messages("hey-repeat")), 1)
+
+    @mute_logger("odoo.sql_db")
+    def test_concurrent_insert_is_retried_not_failed(self):
+        """
+        La fila de otro job no es visible en la instantánea (REPEATABLE READ):
+        el sondeo no la encuentra y el índice único rechaza el INSERT. El job
+        debe reintentarse, no fallar ni contarse como recibido.
+        """
+        payload = make_heynow_payload(message_id="hey-race")
+        self.processor.process_webhook_event("heynow", payload)
+
+        counter = type(self.env["chat.message.counter"])
+        with patch.object(
+            type(self.processor), "_find_processed_message_id", return_value=None
+        ), patch.object(counter, "increment") as increment:
+            with self.assertRaises(RetryableJobError):
+                self.processor.process_webhook_event("heynow", payload)
+        self.assertFalse(
+            [call for call in increment.call_args_list if "received" in call.args]
+        )
+
+        self.assertEqual(len(self._webhook_messages("hey-race")), 1)
+        # Tras el reintento el sondeo ve la fila y lo resuelve como duplicado
+        result = self.processor.process_webhook_event("heynow", payload)
+        self.assertEqual(result["status"], "duplicate")
+
+    def test_counters_are_kept_by_channel_type_until_commit(self):
+        """Se suman después del commit, por tipo de canal y no por contacto"""
+        for message_id in ("hey-count-1", "hey-count-2", "hey-count-1"):
+            self.processor.process_webhook_event(
+                "heynow", make_heynow_payload(message_id=message_id)
+            )
+        pending = self.env.cr.postcommit.data["chat.message.counter"]
+        channel = HeynowChannelType.from_int(HEYNOW_WHATSAPP)
+        self.assertEqual(pending[("heynow", channel, "received")], 2)
+        self.assertEqual(pending[("heynow", channel, "duplicate")], 1)
+        self.assertFalse(
+            self.env["chat.message.counter"].search([("provider_name", "=", "heynow")])
+        )